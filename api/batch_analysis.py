@@ -0,0 +1,170 @@
+"""
+Bulk dream analysis through the OpenAI Batch API.
+
+Reports are written as chunks of BATCH_CHUNK requests to batch input files,
+each line built by dream_analyzer.dream_batch_request. A chunk is submitted
+only while the estimated tokens of unfinished batches stay under
+BATCH_MAX_ENQUEUED_TOKENS (the org's batch queue limit); a rate-limited
+submit just waits for the next poll. Finished batches are downloaded and
+every line is parsed into a DreamGenerationResponse.
+
+Progress is checkpointed to a JSON state file after every step, keyed by a
+hash of the report text. Re-running with the same state file resumes: done
+reports are kept, open batches are polled again, and requests that errored,
+failed validation or were dropped by an expired/failed batch are resubmitted
+up to BATCH_RETRIES times.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import openai
+
+import dream_analyzer
+from dream_analyzer import DreamGenerationResponse
+from llm_usage import LEDGER
+
+BATCH_CHUNK = 200
+BATCH_MAX_ENQUEUED_TOKENS = int(os.environ.get("BATCH_MAX_ENQUEUED_TOKENS", "2000000"))
+BATCH_POLL_S = 30
+BATCH_RETRIES = 2
+BATCH_WINDOW = "24h"
+EXPECTED_OUTPUT_TOKENS = 1500  # a 7-station hex, roughly
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def report_id(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def estimate_tokens(text):
+    # ~4 chars per token, plus the schema and the expected output
+    return (len(dream_analyzer.SYSTEM_PROMPT) + len(dream_analyzer.dream_prompt(text))) // 4 + 500 + EXPECTED_OUTPUT_TOKENS
+
+
+class BatchAnalysis:
+    def __init__(self, texts, state_path, client=None, chunk=BATCH_CHUNK,
+                 max_enqueued_tokens=BATCH_MAX_ENQUEUED_TOKENS, poll_s=BATCH_POLL_S, retries=BATCH_RETRIES):
+        self.client = client or dream_analyzer.get_client()
+        self.texts = {report_id(t): t for t in texts}
+        self.state_path = state_path
+        self.chunk = chunk
+        self.max_enqueued_tokens = max_enqueued_tokens
+        self.poll_s = poll_s
+        self.retries = retries
+        self.state = self._load()
+        for rid in self.texts:
+            self.state["reports"].setdefault(rid, {"status": "pending", "attempts": 0})
+
+    # --- STATE ---
+    def _load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"reports": {}, "batches": {}}
+
+    def _save(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def _ids(self, status):
+        return [rid for rid in self.texts if self.state["reports"][rid]["status"] == status]
+
+    def _open_batches(self):
+        return [bid for bid, b in self.state["batches"].items() if b["status"] not in TERMINAL]
+
+    def enqueued_tokens(self):
+        return sum(self.state["batches"][bid]["tokens"] for bid in self._open_batches())
+
+    def _fail(self, rid, error):
+        report = self.state["reports"][rid]
+        report["error"] = str(error)
+        report["status"] = "pending" if report["attempts"] <= self.retries else "failed"
+
+    # --- SUBMIT ---
+    async def _submit(self):
+        pending = self._ids("pending")
+        while pending:
+            chunk = pending[:self.chunk]
+            tokens = sum(estimate_tokens(self.texts[rid]) for rid in chunk)
+            enqueued = self.enqueued_tokens()
+            # An oversized chunk still goes out alone; otherwise wait for room
+            if enqueued and enqueued + tokens > self.max_enqueued_tokens:
+                break
+            model = await LEDGER.admit("analyze_dream_batch")
+            lines = [json.dumps(dream_analyzer.dream_batch_request(rid, self.texts[rid], model)) for rid in chunk]
+            try:
+                upload = await self.client.files.create(file=("dreams.jsonl", "\n".join(lines).encode()), purpose="batch")
+                batch = await self.client.batches.create(
+                    input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window=BATCH_WINDOW)
+            except openai.RateLimitError as e:
+                print(f"⏳ Batch submit rate-limited, retrying next poll: {e}")
+                break
+            self.state["batches"][batch.id] = {"status": batch.status, "tokens": tokens, "reports": chunk}
+            for rid in chunk:
+                report = self.state["reports"][rid]
+                report.update(status="submitted", batch_id=batch.id, attempts=report["attempts"] + 1)
+            self._save()
+            print(f"📤 Batch {batch.id}: {len(chunk)} reports, ~{tokens} tokens")
+            pending = pending[len(chunk):]
+
+    # --- COLLECT ---
+    async def _collect(self, batch_id):
+        entry = self.state["batches"][batch_id]
+        batch = await self.client.batches.retrieve(batch_id)
+        entry["status"] = batch.status
+        if batch.status not in TERMINAL:
+            return
+        if batch.status != "completed":
+            print(f"⚠️ Batch {batch_id} {batch.status}: {batch.errors}")
+
+        # Expired/cancelled batches still return the lines they finished
+        seen = set()
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                rid = item["custom_id"]
+                if rid not in self.state["reports"]:
+                    continue
+                seen.add(rid)
+                try:
+                    result = dream_analyzer.parse_batch_result(item)
+                    self.state["reports"][rid].update(status="done", result=result.dict(), error=None)
+                except Exception as e:
+                    self._fail(rid, e)
+        for rid in entry["reports"]:
+            if rid not in seen:
+                self._fail(rid, f"no result (batch {batch.status})")
+        self._save()
+
+    async def run(self):
+        """{report text: DreamGenerationResponse} for every report that succeeded."""
+        while True:
+            await self._submit()
+            for batch_id in self._open_batches():
+                await self._collect(batch_id)
+            if not self._ids("pending") and not self._open_batches():
+                break
+            print(f"🔄 {len(self._ids('done'))}/{len(self.texts)} done | {len(self._open_batches())} open batches | "
+                  f"~{self.enqueued_tokens()} tokens enqueued")
+            await asyncio.sleep(self.poll_s)
+
+        failed = self._ids("failed")
+        print(f"✅ Batch analysis: {len(self._ids('done'))} done, {len(failed)} failed")
+        for rid in failed:
+            print(f"   ❌ {rid}: {self.state['reports'][rid].get('error')}")
+        return self.results()
+
+    def results(self):
+        return {
+            self.texts[rid]: DreamGenerationResponse(**self.state["reports"][rid]["result"])
+            for rid in self._ids("done")
+        }
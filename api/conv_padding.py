@@ -0,0 +1,56 @@
+"""
+Conv padding-mode state for the painter pools.
+
+Panoramas need 'circular' padding on every Conv2d so the 360 image wraps
+seamlessly; sprites need the default 'zeros'. Each painter class patches its
+networks exactly once at container boot and then only accepts jobs of its
+own type, so no call ever repatches a shared network mid-flight.
+"""
+
+PADDING_MODES = {"pano": "circular", "sprite": "zeros"}
+
+
+def padding_for(job_type):
+    return PADDING_MODES.get(job_type, "zeros")
+
+
+def apply_padding_mode(model, mode, conv_type=None):
+    """Sets padding_mode on every conv in `model`. Returns how many were patched."""
+    if conv_type is None:
+        import torch
+        conv_type = torch.nn.Conv2d
+
+    patched = 0
+    for m in model.modules():
+        if isinstance(m, conv_type):
+            m.padding_mode = mode
+            patched += 1
+    return patched
+
+
+class PaddingLock:
+    """
+    Owns the padding mode of one painter. `apply` runs once per container;
+    `check` rejects jobs that would need the other mode.
+    """
+
+    def __init__(self, job_type):
+        self.job_type = job_type
+        self.mode = padding_for(job_type)
+        self.applied = False
+
+    def apply(self, *models, conv_type=None):
+        if self.applied:
+            raise RuntimeError(f"Padding already fixed to '{self.mode}'")
+        patched = sum(apply_padding_mode(m, self.mode, conv_type) for m in models)
+        self.applied = True
+        return patched
+
+    def check(self, jobs):
+        for job in jobs:
+            mode = padding_for(job.get("type", "sprite"))
+            if mode != self.mode:
+                raise ValueError(
+                    f"{self.job_type} painter cannot render '{job.get('type')}' jobs "
+                    f"(needs '{mode}' padding, container is '{self.mode}')"
+                )
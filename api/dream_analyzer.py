@@ -1,16 +1,47 @@
+import json
 import os
 import re
+import time
+from types import SimpleNamespace
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
+
+from llm_policy import LLMPolicy, parsed
+from llm_usage import DEFAULT_MODEL, LEDGER
 
 # --- CONFIG ---
 # This runs on the Cloud Run CPU instance
 OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_KEY)
+_client = None
+
+def get_client() -> AsyncOpenAI:
+    """Created on first use, so importing the models (scripts/load_world.py) needs no API key."""
+    global _client
+    if _client is None:
+        # Async so calls can be timed out and hedged; retries come from llm_policy, not the SDK
+        _client = AsyncOpenAI(api_key=OPENAI_KEY, max_retries=0)
+    return _client
+
+# Dream analysis is long and off the interaction path: no hedging, longer deadline
+ANALYSIS_POLICY = LLMPolicy("analyze_dream", deadline=60, attempt_timeout=45, hedge=False)
+INTERACTION_POLICY = LLMPolicy("interaction")
 
 # --- DATA MODELS ---
-class Station(BaseModel):
+STANCE_KEYS = ["idle", "active", "resting", "happy", "sad", "angry", "surprised"]
+AGGRESSIVE_STANCES = {"angry", "surprised"}
+# Background conditions, peaceful -> chaotic (same modifiers as scripts/world_builder.py)
+CHAOS_LEVELS = {
+    1: "serene, hazy, light",
+    2: "still but moving, lightening",
+    3: "sense of motion, darkening",
+    4: "chaotic, sharp, dark"
+}
+
+# LLM output. .parse() sends these as a strict JSON schema, which rejects free-form
+# Dict fields, so asset and runtime state lives only on the document models below.
+class StationSpec(BaseModel):
     id: str
     position_index: int
     entity_name: Optional[str] = None
@@ -19,24 +50,45 @@ class Station(BaseModel):
     entity_greeting: Optional[str] = None
     entity_monologue: Optional[str] = None # NEW: Deep interaction text
     interaction_options: List[str] = Field(default_factory=list)
-    asset_status: str = "PENDING"
-    sprite_frames: List[str] = [] 
-    current_stance: str = "idle" 
 
-class DreamHex(BaseModel):
+class DreamHexSpec(BaseModel):
     title: str
     slug: str
     description_360: str
     central_imagery: str
-    stations: List[Station]
-    background_frames: List[str] = []
+    stations: List[StationSpec]
 
-class DreamGenerationResponse(BaseModel):
-    hex: DreamHex
+class DreamAnalysis(BaseModel):
+    hex: DreamHexSpec
     summary_short: str = Field(..., description="One sentence summary.")
     summary_long: str = Field(..., description="3-5 sentence summary.")
     entities: List[str] = Field(default_factory=list)
 
+# Firestore `dreams` documents: the analysis plus everything rendered for it
+class Station(StationSpec):
+    asset_status: str = "PENDING" # PENDING, GENERATING, COMPLETE or FAILED
+    sprite_frames: List[str] = [] 
+    sprite_tiers: Dict[str, List[str]] = {} # e.g. {"md": [...]}, smaller renditions of sprite_frames
+    sprite_atlas: Optional[Dict[str, Any]] = None # sprite sheet url + cols/rows/frame rects, see sprite_atlas.py
+    sprite_variant: Optional[str] = None # which of sprite_atlas's variants to play
+    stance_assets: Dict[str, Dict[str, Any]] = {} # stance -> {"frames", "tiers"} or {"atlas", "variant"}; missing stances are rendered on first use
+    current_stance: str = "idle" 
+
+class DreamHex(DreamHexSpec):
+    stations: List[Station]
+    background_frames: List[str] = []
+    background_status: str = "PENDING" # same states as Station.asset_status; resume skips COMPLETE pieces
+    background_tiers: Dict[str, List[str]] = {} # e.g. {"md": [...], "sm": [...]}
+    background_preview: Optional[str] = None # tiny blurred frame 0 as a data URI, set before background_frames
+    background_video: Optional[Dict[str, Any]] = None # looping clip {url, codec, fps}; frames are the fallback
+    background_tiles: Optional[Dict[str, Any]] = None # tile manifest {layout, levels, url_template}, see pano_tiles.py
+    background_levels: Dict[str, Dict[str, Any]] = {} # "level_N" -> {frames, tiers, video, tiles}; background_* shows chaos_level
+    chaos_level: int = 1
+    station_stances: Dict[str, str] = {} # station id -> last stance, drives chaos_level
+
+class DreamGenerationResponse(DreamAnalysis):
+    hex: DreamHex
+
 class InteractionResponse(BaseModel):
     new_state_start: str
     new_state_end: str
@@ -82,28 +134,95 @@ Analyze the context and the user's action to calculate the Entity's reaction.
    - If the action seems engaged, set 'unlock_trigger' to 'UNLOCK_NEW_DREAM'.
 """
 
-async def analyze_dream_text(text: str) -> DreamGenerationResponse:
-    prompt = f"Dream Report: {text}\n\nAnalyze the report. Provide a short (1-sentence) summary, a long (3-5 sentence) summary, and a list of entities. Then generate the structured DreamHex data with 7 stations."
-    
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
-        response_format=DreamGenerationResponse,
-    )
-    data = completion.choices[0].message.parsed
+async def structured_call(policy: LLMPolicy, system: str, user: str, response_format, validate=parsed,
+                          user_id: Optional[str] = None, dream_id: Optional[str] = None, model: Optional[str] = None):
+    """
+    One structured completion under `policy`, budgeted and accounted in llm_usage.
+    Pass `model` when the caller already admitted the call, so the budget isn't checked twice.
+    """
+    if model is None:
+        model = await LEDGER.admit(policy.name, user_id, dream_id)
+
+    async def attempt():
+        started = time.perf_counter()
+        completion = await get_client().beta.chat.completions.parse(
+            model=model,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            response_format=response_format,
+        )
+        # Every attempt that came back is billed, including retried and losing hedged ones
+        LEDGER.record(policy.name, model, completion.usage, time.perf_counter() - started, user_id, dream_id)
+        return completion
+
+    return parsed(await policy.run(attempt, validate=validate))
+
+def dream_prompt(text: str) -> str:
+    return f"Dream Report: {text}\n\nAnalyze the report. Provide a short (1-sentence) summary, a long (3-5 sentence) summary, and a list of entities. Then generate the structured DreamHex data with 7 stations."
+
+def to_document(analysis: DreamAnalysis) -> DreamGenerationResponse:
+    """LLM output -> document model with every asset field at its default, slug cleaned."""
+    data = DreamGenerationResponse(**analysis.dict())
     data.hex.slug = re.sub(r'[^a-z0-9-]', '', data.hex.slug.lower())
     return data
 
-async def analyze_interaction_text(world_context: Dict[str, Any], entity_name: str, current_stance: str, command: str) -> InteractionResponse:
+def strict_response_format(model) -> Dict[str, Any]:
+    """The strict json_schema response_format .parse() sends for `model`."""
+    tool = openai.pydantic_function_tool(model)["function"]
+    return {"type": "json_schema", "json_schema": {"name": tool["name"], "schema": tool["parameters"], "strict": True}}
+
+async def analyze_dream_text(text: str, user_id: Optional[str] = None, model: Optional[str] = None) -> DreamGenerationResponse:
+    analysis = await structured_call(ANALYSIS_POLICY, SYSTEM_PROMPT, dream_prompt(text), DreamAnalysis, user_id=user_id, model=model)
+    return to_document(analysis)
+
+# --- BATCH ANALYSIS ---
+# Same request as analyze_dream_text, as one line of a Batch API input file
+def dream_batch_request(custom_id: str, text: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": dream_prompt(text)}],
+            "response_format": strict_response_format(DreamAnalysis),
+        },
+    }
+
+def parse_batch_result(item: Dict[str, Any]) -> DreamGenerationResponse:
+    """One Batch API output/error line -> DreamGenerationResponse; ValueError if unusable."""
+    if item.get("error"):
+        raise ValueError(f"request error: {item['error']}")
+    response = item.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(f"status {response.get('status_code')}: {body.get('error')}")
+    choice = body["choices"][0]
+    if choice.get("finish_reason") == "length":
+        raise ValueError("output truncated")
+    if choice["message"].get("refusal"):
+        raise ValueError(f"refusal: {choice['message']['refusal']}")
+    # Batch output carries usage as a plain dict; the ledger reads attributes
+    usage = SimpleNamespace(**(body.get("usage") or {}))
+    LEDGER.record("analyze_dream_batch", body.get("model", DEFAULT_MODEL), usage, 0.0, batch=True)
+    return to_document(DreamAnalysis(**json.loads(choice["message"]["content"])))
+
+async def analyze_dreams_batch(texts: List[str], state_path: str) -> Dict[str, DreamGenerationResponse]:
+    """Many reports through the Batch API; resumable from state_path. See batch_analysis.py."""
+    from batch_analysis import BatchAnalysis
+    return await BatchAnalysis(texts, state_path).run()
+
+def validate_interaction(completion):
+    rx = parsed(completion)
+    if len(rx.new_options) != 4:
+        raise ValueError(f"expected 4 options, got {len(rx.new_options)}")
+
+async def analyze_interaction_text(world_context: Dict[str, Any], entity_name: str, current_stance: str, command: str,
+                                   user_id: Optional[str] = None, dream_id: Optional[str] = None) -> InteractionResponse:
     # Contextual query building
     context_str = f"World Description: {world_context.get('world_description', 'N/A')}\n"
     context_str += f"Interaction History: {world_context.get('interaction_history', 'No previous contact.')}\n"
     
     query = f"{context_str}\nTarget Entity: {entity_name} (Current Stance: {current_stance}).\nUser Action: {command}"
     
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": INTERACTION_PROMPT}, {"role": "user", "content": query}],
-        response_format=InteractionResponse,
-    )
-    return completion.choices[0].message.parsed
\ No newline at end of file
+    return await structured_call(INTERACTION_POLICY, INTERACTION_PROMPT, query, InteractionResponse,
+                                 validate=validate_interaction, user_id=user_id, dream_id=dream_id)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Batching helpers for DreamPainter.
+
+A "job" is one animated asset (a pano background or a station sprite):
+    {"prompt_a", "prompt_b", "type", "frames", "path_prefix", "strength",
+     "format", "tiers", "quality"}
+
+Jobs are grouped by (width, height, padding_mode) and frame k of every job
+in a group runs through the img2img pipe as one batched call. Nothing here
+imports torch or diffusers, so the planning runs on CPU with a stub pipe.
+"""
+
+from conv_padding import padding_for
+from image_encoding import OUTPUT_FORMATS, TIERS_BY_TYPE
+
+STYLE_PREFIX = "Ink and watercolor style, "
+FRAME_SIZES = {"pano": (1024, 512), "sprite": (512, 512)}
+DEFAULT_STRENGTH = 0.5
+MAX_BATCH = 8
+NUM_STEPS = 2
+
+
+def normalize_job(job):
+    """Fills in defaults so every job carries its size, padding, strength and encoding."""
+    job = dict(job)
+    job_type = job.get("type", "sprite")
+    width, height = FRAME_SIZES.get(job_type, FRAME_SIZES["sprite"])
+    job["type"] = job_type
+    job.setdefault("prompt_b", None)
+    job.setdefault("frames", 1)
+    job.setdefault("strength", DEFAULT_STRENGTH)
+    job.setdefault("width", width)
+    job.setdefault("height", height)
+    job.setdefault("padding", padding_for(job_type))
+    job.setdefault("format", OUTPUT_FORMATS.get(job_type, "png"))
+    job.setdefault("tiers", TIERS_BY_TYPE.get(job_type, ["full"]))
+    job.setdefault("quality", None)
+    return job
+
+
+def frame_prompt(job, i):
+    """First half of the frames use prompt_a, the second half prompt_b."""
+    p = job["prompt_a"] if i < job["frames"] / 2 else (job["prompt_b"] or job["prompt_a"])
+    return f"{STYLE_PREFIX}{p}"
+
+
+def frame_strength(job, i):
+    # Frame 0 starts from the grey canvas, later frames drift from the last one
+    return 1.0 if i == 0 else job["strength"]
+
+
+def group_key(job):
+    return (job["width"], job["height"], job["padding"])
+
+
+def group_jobs(jobs):
+    """Returns {(width, height, padding): [job indices]} in first-seen order."""
+    groups = {}
+    for idx, job in enumerate(jobs):
+        groups.setdefault(group_key(job), []).append(idx)
+    return groups
+
+
+def plan_steps(jobs, max_batch=MAX_BATCH):
+    """
+    Yields (key, frame_index, strength, [job indices]) pipe calls.
+    Groups are processed one after another so padding flips at most once per
+    group; within a group, frame k of all jobs is split only by strength and
+    by max_batch.
+    """
+    for key, idxs in group_jobs(jobs).items():
+        max_frames = max(jobs[j]["frames"] for j in idxs)
+        for k in range(max_frames):
+            by_strength = {}
+            for j in idxs:
+                if k < jobs[j]["frames"]:
+                    by_strength.setdefault(frame_strength(jobs[j], k), []).append(j)
+            for strength, members in by_strength.items():
+                for start in range(0, len(members), max_batch):
+                    yield key, k, strength, members[start:start + max_batch]
+
+
+def run_batches(pipe, jobs, on_frame, blank, set_padding=None, max_batch=MAX_BATCH):
+    """
+    Runs every frame of every job through `pipe`.
+
+    pipe:        diffusers-style callable returning an object with `.images`
+    on_frame:    called as on_frame(job_index, frame_index, image)
+    blank:       factory blank(width, height) for the starting canvas
+    set_padding: optional callback, invoked when the padding mode changes
+    """
+    jobs = [normalize_job(j) for j in jobs]
+    current = {}
+    active_padding = None
+
+    for key, k, strength, idxs in plan_steps(jobs, max_batch):
+        width, height, padding = key
+        if set_padding and padding != active_padding:
+            set_padding(padding)
+            active_padding = padding
+
+        images = [current.get(j) or blank(width, height) for j in idxs]
+        out = pipe(
+            prompt=[frame_prompt(jobs[j], k) for j in idxs],
+            image=images,
+            strength=strength,
+            num_inference_steps=NUM_STEPS,
+            guidance_scale=0.0
+        ).images
+
+        for j, img in zip(idxs, out):
+            current[j] = img
+            on_frame(j, k, img)
+
+    return jobs
@@ -0,0 +1,155 @@
+"""
+Coalesced, predictive warmup of the Modal painter pools.
+
+The manager remembers when each pool was last seen warm: any render that
+finished, or a wake_up that returned. A pool counts as warm for WARM_TTL_S
+afterwards, a little under the workers' scaledown_window. Warmup requests
+then go through three checks:
+
+    warm       the pool answered recently, nothing to do
+    coalesced  a wake_up is already in flight, or one started within COALESCE_S
+    waking     otherwise, one wake_up for the whole burst of requests
+
+A background tick also wakes pools ahead of load. It estimates the dream
+submission rate over RATE_WINDOW_S and wakes a pool whose warmth is about to
+lapse when another submission within WARM_TTL_S is likely (Poisson,
+P >= PREDICT_P).
+
+Every render call is timed and filed as cold (the pool was not warm when the
+call started) or warm, so the cold-start penalty shows up in /metrics.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+
+WARM_TTL_S = int(os.environ.get("WARM_TTL_S", "100"))  # modal_worker scaledown_window is 120
+COALESCE_S = 15
+RATE_WINDOW_S = 600
+PREDICT_P = 0.5
+TICK_S = 20
+LATENCY_WINDOW = 200
+
+
+class WarmupManager:
+    def __init__(self, wake, pools, warm_ttl=WARM_TTL_S, coalesce=COALESCE_S, rate_window=RATE_WINDOW_S, clock=time.monotonic):
+        """wake(pool) returns an awaitable that resolves once that pool's container answers."""
+        self.wake = wake
+        self.pools = list(pools)
+        self.warm_ttl = warm_ttl
+        self.coalesce = coalesce
+        self.rate_window = rate_window
+        self.interval = TICK_S
+        self.clock = clock
+        self.last_warm = {}    # pool -> time last seen warm
+        self.last_wake = {}    # pool -> time the last wake_up was sent
+        self.inflight = {}     # pool -> wake_up task
+        self.submissions = deque()
+        self.latencies = defaultdict(lambda: {"cold": deque(maxlen=LATENCY_WINDOW), "warm": deque(maxlen=LATENCY_WINDOW)})
+        self.stats = defaultdict(lambda: {"requests": 0, "wakes": 0, "predictive_wakes": 0, "coalesced": 0, "already_warm": 0})
+
+    # --- STATE ---
+    def is_warm(self, pool, ahead=0.0):
+        """Warm now and still warm `ahead` seconds from now."""
+        seen = self.last_warm.get(pool)
+        return seen is not None and self.clock() + ahead - seen < self.warm_ttl
+
+    def mark_warm(self, pool):
+        self.last_warm[pool] = self.clock()
+
+    def submission_rate(self):
+        """Dream submissions per second over the rate window."""
+        now = self.clock()
+        while self.submissions and now - self.submissions[0] > self.rate_window:
+            self.submissions.popleft()
+        return len(self.submissions) / self.rate_window
+
+    def load_likely(self):
+        return 1 - math.exp(-self.submission_rate() * self.warm_ttl) >= PREDICT_P
+
+    # --- WAKING ---
+    async def _wake(self, pool):
+        try:
+            await self.wake(pool)
+            self.mark_warm(pool)
+        except Exception as e:
+            print(f"⚠️ Wake-up of {pool} pool failed: {e}")
+        finally:
+            self.inflight.pop(pool, None)
+
+    def _maybe_wake(self, pool, predictive=False):
+        stats = self.stats[pool]
+        # Predictive wakes look one tick ahead, so the pool never lapses between ticks
+        if self.is_warm(pool, ahead=self.interval if predictive else 0):
+            stats["already_warm"] += not predictive
+            return "warm"
+        now = self.clock()
+        if pool in self.inflight or now - self.last_wake.get(pool, -math.inf) < self.coalesce:
+            stats["coalesced"] += not predictive
+            return "coalesced"
+        self.last_wake[pool] = now
+        stats["predictive_wakes" if predictive else "wakes"] += 1
+        self.inflight[pool] = asyncio.create_task(self._wake(pool))
+        return "waking"
+
+    def request(self):
+        """A client asked for warmup; returns {pool: "warm" | "coalesced" | "waking"}."""
+        out = {}
+        for pool in self.pools:
+            self.stats[pool]["requests"] += 1
+            out[pool] = self._maybe_wake(pool)
+        return out
+
+    def ensure_warm(self, pool):
+        """Wake one pool ahead of a render known to be coming (e.g. sprites after the background)."""
+        return self._maybe_wake(pool)
+
+    def note_submission(self):
+        self.submissions.append(self.clock())
+
+    def tick(self):
+        """Wake pools about to go cold when more submissions are likely."""
+        if not self.load_likely():
+            return {}
+        return {pool: self._maybe_wake(pool, predictive=True) for pool in self.pools}
+
+    async def run(self, interval=TICK_S):
+        self.interval = interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"⚠️ Warmup tick failed: {e}")
+
+    # --- LATENCY ---
+    @asynccontextmanager
+    async def track(self, pool):
+        """Wraps one render call: times it as cold or warm and marks the pool warm after."""
+        kind = "warm" if self.is_warm(pool) else "cold"
+        started = time.perf_counter()
+        yield kind
+        elapsed = time.perf_counter() - started
+        self.latencies[pool][kind].append(elapsed)
+        self.mark_warm(pool)
+        print(f"⏱️ {pool} render ({kind}): {elapsed:.1f}s")
+
+    def snapshot(self):
+        def summary(values):
+            ordered = sorted(values)
+            pct = lambda q: round(1000 * ordered[int(q * (len(ordered) - 1))]) if ordered else None
+            return {"calls": len(ordered), "p50_ms": pct(0.5), "p95_ms": pct(0.95)}
+
+        return {
+            "submissions_per_min": round(60 * self.submission_rate(), 2),
+            "pools": {
+                pool: {
+                    "warm": self.is_warm(pool),
+                    **self.stats[pool],
+                    "latency": {kind: summary(v) for kind, v in self.latencies[pool].items()},
+                }
+                for pool in self.pools
+            },
+        }
@@ -0,0 +1,83 @@
+"""
+Output encodings and size tiers for generated frames.
+
+Each frame is uploaded once per size tier: the "full" tier keeps the legacy
+`{prefix}_{i}.{ext}` name, smaller tiers add a suffix (`{prefix}_{i}_md.{ext}`).
+Formats are chosen by extension; AVIF falls back to WebP when the installed
+Pillow has no AVIF encoder.
+"""
+import base64
+import io
+
+# ext -> (PIL format, content type, save kwargs)
+FORMATS = {
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "image/avif", {"quality": 60, "speed": 6}),
+    "png": ("PNG", "image/png", {"optimize": True}),
+}
+ALPHA_FORMATS = {"webp", "avif", "png"}
+
+OUTPUT_FORMATS = {"pano": "jpg", "sprite": "webp"}
+SIZE_TIERS = {"full": 1.0, "md": 0.5, "sm": 0.25}
+TIERS_BY_TYPE = {"pano": ["full", "md", "sm"], "sprite": ["full", "md"]}
+PREVIEW_WIDTH = 64
+
+
+def resolve_format(ext):
+    """Returns `ext`, or the nearest format this Pillow build can actually write."""
+    if ext == "avif":
+        from PIL import features
+        if not features.check("avif"):
+            print("⚠️ AVIF encoder unavailable, falling back to WebP.")
+            return "webp"
+    return ext if ext in FORMATS else "png"
+
+
+def encode_image(image, path, quality=None):
+    """Returns (bytes, content_type) for the format implied by the path extension."""
+    ext = path.rsplit(".", 1)[-1].lower()
+    fmt, content_type, opts = FORMATS.get("jpg" if ext == "jpeg" else ext, FORMATS["png"])
+    opts = dict(opts)
+    if quality is not None and "quality" in opts:
+        opts["quality"] = quality
+    if fmt == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    b = io.BytesIO()
+    image.save(b, format=fmt, **opts)
+    return b.getvalue(), content_type
+
+
+def tier_path(path_prefix, index, tier, ext):
+    suffix = "" if tier == "full" else f"_{tier}"
+    return f"{path_prefix}_{index}{suffix}.{ext}"
+
+
+def resize_for_tier(image, tier):
+    scale = SIZE_TIERS[tier]
+    if scale == 1.0:
+        return image
+    from PIL import Image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def renditions(image, path_prefix, index, ext, tiers, quality=None):
+    """Encodes one frame for every tier: [(tier, path, bytes, content_type)]."""
+    out = []
+    for tier in tiers:
+        path = tier_path(path_prefix, index, tier, ext)
+        data, content_type = encode_image(resize_for_tier(image, tier), path, quality)
+        out.append((tier, path, data, content_type))
+    return out
+
+
+def preview_data_uri(image, width=PREVIEW_WIDTH, blur=1.5, quality=40):
+    """Tiny blurred JPEG as an inline data URI (~1-2 KB) for a first paint."""
+    from PIL import ImageFilter
+
+    height = max(1, round(image.height * width / image.width))
+    small = image.convert("RGB").resize((width, height)).filter(ImageFilter.GaussianBlur(blur))
+    b = io.BytesIO()
+    small.save(b, format="JPEG", quality=quality)
+    return "data:image/jpeg;base64," + base64.b64encode(b.getvalue()).decode("ascii")
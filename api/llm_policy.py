@@ -0,0 +1,134 @@
+"""
+Request policy for LLM calls: deadlines, jittered retries and hedging.
+
+Each call site owns an LLMPolicy. `run(make_call, validate)` keeps retrying
+transient API errors, timeouts and responses that fail validation until the
+overall deadline, with exponential backoff and full jitter in between. With
+hedging on, once an attempt has been outstanding longer than the p95 latency
+observed for that policy, a duplicate request is sent; the first success wins
+and the other is cancelled.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import openai
+from pydantic import ValidationError
+
+LLM_DEADLINE_S = float(os.environ.get("LLM_DEADLINE_S", "20"))
+LLM_ATTEMPT_TIMEOUT_S = float(os.environ.get("LLM_ATTEMPT_TIMEOUT_S", "10"))
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", "2"))
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "true").lower() == "true"
+BACKOFF_BASE_S = 0.25
+LATENCY_WINDOW = 200   # recent successful attempts kept for the p95
+HEDGE_MIN_SAMPLES = 20  # don't hedge on a cold estimate
+
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+# Bad payloads: schema violations, truncated output, refusals, failed validate()
+INVALID_ERRORS = (ValidationError, ValueError, openai.LengthFinishReasonError)
+
+
+class LLMCallFailed(Exception):
+    def __init__(self, name, attempts, cause):
+        super().__init__(f"{name} failed after {attempts} attempts: {cause!r}")
+        self.name = name
+        self.attempts = attempts
+        self.cause = cause
+
+
+def parsed(completion):
+    """The parsed structured output, or ValueError on a refusal (retried like invalid output)."""
+    message = completion.choices[0].message
+    if message.parsed is None:
+        raise ValueError(f"no parsed output (refusal: {message.refusal})")
+    return message.parsed
+
+
+class LLMPolicy:
+    def __init__(self, name, deadline=LLM_DEADLINE_S, attempt_timeout=LLM_ATTEMPT_TIMEOUT_S,
+                 retries=LLM_RETRIES, hedge=LLM_HEDGE):
+        self.name = name
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+
+    def p95(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _attempt(self, make_call, validate):
+        started = time.perf_counter()
+        result = await make_call()
+        if validate:
+            validate(result)
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, make_call, validate):
+        first = asyncio.create_task(self._attempt(make_call, validate))
+        second = None
+        delay = self.p95() if self.hedge else None
+        if delay is None:
+            return await first
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            self.stats["hedges"] += 1
+            second = asyncio.create_task(self._attempt(make_call, validate))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Losers (and everything, if the deadline cancels us) stop here
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def run(self, make_call, validate=None):
+        """
+        make_call: zero-arg function returning a fresh awaitable per attempt.
+        validate: optional check on the result; raise ValueError to retry.
+        """
+        self.stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+        error = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                return await asyncio.wait_for(self._hedged(make_call, validate), min(self.attempt_timeout, remaining))
+            except TRANSIENT_ERRORS + INVALID_ERRORS as e:
+                error = e
+            if attempt == self.retries:
+                break
+            self.stats["retries"] += 1
+            backoff = random.uniform(0, BACKOFF_BASE_S * 2 ** attempt)
+            print(f"⚠️ {self.name} attempt {attempt + 1} failed ({type(error).__name__}), retrying in {backoff:.2f}s")
+            await asyncio.sleep(min(backoff, max(0.0, deadline_at - loop.time())))
+        self.stats["failures"] += 1
+        raise LLMCallFailed(self.name, attempt + 1, error or asyncio.TimeoutError("deadline exceeded"))
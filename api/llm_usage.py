@@ -0,0 +1,224 @@
+"""
+Token and cost accounting for LLM calls, with budgets.
+
+Every completion (including retried and hedged attempts that returned) is
+recorded with its token usage, cost and latency. Running totals are kept in
+memory per user/day, per dream and per day, and the deltas are flushed to
+Firestore (`llm_usage/{scope}`) with Increment writes every
+FLUSH_INTERVAL_S, so the hot path never waits on a write. Totals from other
+instances are picked up when a key is first seen, so budgets are enforced
+per instance on top of the last flushed baseline - approximate, by design.
+
+Budgets (USD, 0 disables): past DOWNGRADE_AT of a budget, calls switch to
+DOWNGRADE_MODEL; past the budget they are rejected with BudgetExceeded.
+
+Scopes from past days, and dreams idle for DREAM_IDLE_S, are dropped from
+memory once flushed.
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import quote
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DOWNGRADE_MODEL = os.environ.get("LLM_DOWNGRADE_MODEL", "gpt-4.1-nano")
+# USD per 1M tokens: (prompt, completion)
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+BUDGETS = {
+    "user": float(os.environ.get("LLM_BUDGET_USER_DAILY_USD", "0.50")),
+    "dream": float(os.environ.get("LLM_BUDGET_DREAM_USD", "0.25")),
+    "day": float(os.environ.get("LLM_BUDGET_DAILY_USD", "50")),
+}
+DOWNGRADE_AT = 0.8
+BATCH_DISCOUNT = 0.5  # Batch API requests bill at half price
+FLUSH_INTERVAL_S = 30
+DREAM_IDLE_S = 6 * 3600
+LATENCY_WINDOW = 500
+COLLECTION = "llm_usage"
+FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cost_usd")
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, scope, spent, budget):
+        super().__init__(f"{scope} budget exceeded (${spent:.4f} of ${budget:.4f})")
+        self.scope = scope
+
+
+def cost_usd(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, PRICES[DEFAULT_MODEL])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def doc_id(key):
+    """Firestore document id for a scope key; user and dream ids may contain '/'."""
+    return quote(key, safe=":")
+
+
+def permanent_error(e):
+    """Errors a retry won't fix: a malformed document or a rejected write."""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return isinstance(e, ValueError)
+    return isinstance(e, (ValueError, exceptions.InvalidArgument, exceptions.PermissionDenied))
+
+
+class UsageLedger:
+    def __init__(self, budgets=BUDGETS, flush_interval=FLUSH_INTERVAL_S):
+        self.budgets = budgets
+        self.flush_interval = flush_interval
+        self.db_fn = None
+        self.lock = threading.Lock()
+        self.totals = defaultdict(lambda: dict.fromkeys(FIELDS, 0))   # scope key -> totals incl. baseline
+        self.pending = defaultdict(lambda: dict.fromkeys(FIELDS, 0))  # scope key -> unflushed deltas
+        self.loaded = set()
+        self.touched = {}  # scope key -> last time it was admitted or recorded
+        self.last_flush = time.time()
+        self.calls = defaultdict(lambda: {**dict.fromkeys(FIELDS, 0), "downgrades": 0, "rejections": 0})
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def connect(self, db_fn):
+        """db_fn() returns a Firestore client; without it the ledger is memory-only."""
+        self.db_fn = db_fn
+
+    def scopes(self, user_id=None, dream_id=None):
+        day = today()
+        keys = {"day": f"day:{day}"}
+        if user_id:
+            keys["user"] = f"user:{user_id}:{day}"
+        if dream_id:
+            keys["dream"] = f"dream:{dream_id}"
+        return keys
+
+    def _baseline(self, key):
+        if key in self.loaded or not self.db_fn:
+            return
+        self.loaded.add(key)
+        try:
+            snap = self.db_fn().collection(COLLECTION).document(doc_id(key)).get()
+            if snap.exists:
+                stored = snap.to_dict()
+                with self.lock:
+                    for f in FIELDS:
+                        self.totals[key][f] += stored.get(f, 0)
+        except Exception as e:
+            print(f"⚠️ Usage baseline for {key} unavailable: {e}")
+
+    async def admit(self, call, user_id=None, dream_id=None):
+        """Model to use for this call; raises BudgetExceeded when a budget is spent."""
+        model = DEFAULT_MODEL
+        for scope, key in self.scopes(user_id, dream_id).items():
+            budget = self.budgets.get(scope) or 0
+            if not budget:
+                continue
+            if key not in self.loaded:
+                # Blocking Firestore read, once per key; keep it off the event loop
+                await asyncio.to_thread(self._baseline, key)
+            self.touched[key] = time.time()
+            spent = self.totals.get(key, {}).get("cost_usd", 0)
+            if spent >= budget:
+                self.calls[call]["rejections"] += 1
+                raise BudgetExceeded(scope, spent, budget)
+            if spent >= DOWNGRADE_AT * budget:
+                model = DOWNGRADE_MODEL
+        if model != DEFAULT_MODEL:
+            self.calls[call]["downgrades"] += 1
+        return model
+
+    def record(self, call, model, usage, latency, user_id=None, dream_id=None, batch=False):
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        delta = {
+            "calls": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": cost_usd(model, prompt_tokens, completion_tokens) * (BATCH_DISCOUNT if batch else 1),
+        }
+        with self.lock:
+            for key in self.scopes(user_id, dream_id).values():
+                self.touched[key] = time.time()
+                for f in FIELDS:
+                    self.totals[key][f] += delta[f]
+                    self.pending[key][f] += delta[f]
+            for f in FIELDS:
+                self.calls[call][f] += delta[f]
+            self.latencies[call].append(latency)
+            due = time.time() - self.last_flush >= self.flush_interval
+        if due:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+            self.last_flush = time.time()
+        if not pending or not self.db_fn:
+            self._evict()
+            return
+        from google.cloud import firestore
+
+        try:
+            db = self.db_fn()
+            batch = db.batch()
+            for key, delta in pending.items():
+                fields = {f: firestore.Increment(v) for f, v in delta.items()}
+                fields["updated_at"] = firestore.SERVER_TIMESTAMP
+                batch.set(db.collection(COLLECTION).document(doc_id(key)), fields, merge=True)
+            batch.commit()
+        except Exception as e:
+            if permanent_error(e):
+                # Retrying would fail the same way and hold every other key's deltas hostage
+                print(f"❌ Usage flush rejected, dropping {len(pending)} keys: {e}")
+            else:
+                # Put the deltas back so the next flush retries them
+                print(f"⚠️ Usage flush failed ({len(pending)} keys): {e}")
+                with self.lock:
+                    for key, delta in pending.items():
+                        for f in FIELDS:
+                            self.pending[key][f] += delta[f]
+        self._evict()
+
+    def _evict(self):
+        """Forget flushed scopes from past days and dreams that went idle."""
+        now = time.time()
+        suffix = f":{today()}"
+        with self.lock:
+            for key in list(self.totals):
+                if key in self.pending:
+                    continue
+                if key.startswith("dream:"):
+                    stale = now - self.touched.get(key, 0) > DREAM_IDLE_S
+                else:
+                    stale = not key.endswith(suffix)
+                if stale:
+                    self.totals.pop(key, None)
+                    self.touched.pop(key, None)
+                    self.loaded.discard(key)
+
+    def snapshot(self):
+        """Per-call totals and latency percentiles plus today's spend, for /metrics."""
+        def pct(values, q):
+            ordered = sorted(values)
+            return round(1000 * ordered[int(q * (len(ordered) - 1))]) if ordered else None
+
+        with self.lock:
+            calls = {
+                name: {**stats, "cost_usd": round(stats["cost_usd"], 6),
+                       "latency_ms_p50": pct(self.latencies[name], 0.5),
+                       "latency_ms_p95": pct(self.latencies[name], 0.95)}
+                for name, stats in self.calls.items()
+            }
+            day = dict(self.totals.get(f"day:{today()}", dict.fromkeys(FIELDS, 0)))
+            return {"calls": calls, "today": day, "budgets": self.budgets, "pending_keys": len(self.pending)}
+
+
+LEDGER = UsageLedger()
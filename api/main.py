@@ -1,16 +1,26 @@
 import os
 import asyncio
+import time
 import uuid 
 import modal
 import random
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+import threading
+from datetime import datetime, timezone
+from fastapi import FastAPI, BackgroundTasks, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from google.api_core.exceptions import NotFound
 from google.cloud import firestore
 from google.cloud import storage
 from pydantic import BaseModel
 from typing import List, Optional, Any, Dict
 
 import dream_analyzer
+import quick_analyzer
+import world_shards
+from gpu_warmup import WarmupManager
+from quality_tiers import TIERS, QualityController
+from llm_policy import LLMCallFailed
+from llm_usage import LEDGER, BudgetExceeded
 
 app = FastAPI()
 
@@ -30,9 +40,25 @@ def get_storage():
         _storage_client = storage.Client(project=PROJECT_ID)
     return _storage_client
 
+LEDGER.connect(get_db)
+
 # --- CONFIG ---
 TEST_MODE = os.environ.get("TEST_MODE", "false").lower() == "true"
+# Pack each station's frames into one sprite sheet (station.sprite_atlas) instead of per-frame files
+SPRITE_ATLAS = os.environ.get("SPRITE_ATLAS", "false").lower() == "true"
+# Also encode backgrounds as a looping clip (hex.background_video): "h264", "vp9", "av1" or unset
+BG_VIDEO_CODEC = os.environ.get("BG_VIDEO_CODEC") or None
+# Also slice backgrounds into view-dependent tiles (hex.background_tiles): "cubemap", "equirect" or unset
+BG_TILE_LAYOUT = os.environ.get("BG_TILE_LAYOUT") or None
 GCS_BUCKET = os.environ.get("GCS_BUCKET_NAME", "dreamhex-assets-dreamhex")
+# Waterfall frame counts, sizes and station count follow GPU load; TEST_MODE pins the smallest run
+QUALITY = QualityController(pinned="test" if TEST_MODE else None)
+# World shards are content-addressed and cached forever; only the index goes stale
+WORLD_INDEX_TTL = int(os.environ.get("WORLD_INDEX_TTL", "60"))
+WORLD_SHARD_CACHE = 256
+SHARD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Required as X-Admin-Token on /admin/* endpoints; unset disables them
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 if GCS_BUCKET:
     BASE_URL = f"https://storage.googleapis.com/{GCS_BUCKET}"
 else:
@@ -48,15 +74,33 @@ app.add_middleware(
 )
 
 # --- MODAL CONNECTION ---
-DreamPainter = modal.Cls.from_name("dreamhex-worker", "DreamPainter")
+# Pano and sprite work go to separate pools whose conv padding is fixed at boot
+PAINTER_CLASSES = {
+    "pano": modal.Cls.from_name("dreamhex-worker", "PanoPainter"),
+    "sprite": modal.Cls.from_name("dreamhex-worker", "SpritePainter"),
+}
 
-def get_painter_instance():
+def get_painter_instance(job_type: str = "sprite"):
     try:
-        return DreamPainter() 
+        return PAINTER_CLASSES[job_type]()
     except Exception as e:
         print(f"❌ Modal Connection Error: {e}")
         return None
 
+async def wake_pool(job_type: str):
+    painter = get_painter_instance(job_type)
+    if not painter: raise RuntimeError(f"{job_type} painter unavailable")
+    await painter.wake_up.remote.aio()
+
+# Coalesces client warmups, wakes pools ahead of predicted load, times cold vs warm renders
+WARMUP = WarmupManager(wake_pool, PAINTER_CLASSES)
+_warmup_ticker = None
+
+@app.on_event("startup")
+async def start_warmup_ticker():
+    global _warmup_ticker
+    _warmup_ticker = asyncio.create_task(WARMUP.run())
+
 # --- MODELS ---
 class DreamReport(BaseModel):
     user_id: str
@@ -76,66 +120,485 @@ class WarmupRequest(BaseModel):
 class DreamAction(BaseModel):
     user_id: str
 
+class ResumeRequest(BaseModel):
+    limit: int = 50
+    concurrency: int = 2
+    stuck_after_s: int = 15 * 60
+    dry_run: bool = False
+
 # --- WATERFALL GENERATION ---
-async def waterfall_generation(dream_data: dict[str, Any], doc_ref: firestore.DocumentReference):
-    painter = get_painter_instance()
-    if not painter: return
+async def stream_batch(painter, jobs, on_event):
+    """Runs jobs through generate_batch_events, forwarding preview/frame events. Returns the assets."""
+    assets = None
+    started = time.monotonic()
+    async with WARMUP.track(jobs[0]["type"]) as kind:
+        async for event in painter.generate_batch_events.remote_gen.aio(jobs):
+            if event["type"] == "assets":
+                assets = event["assets"]
+            else:
+                on_event(event)
+    # Boot time says nothing about load, so cold calls don't move the quality tier
+    if kind == "warm":
+        QUALITY.observe(time.monotonic() - started, sum(job["frames"] for job in jobs))
+    return assets
+
+def ready_prefix(slots: Dict[int, str]) -> List[str]:
+    """Frames can finish out of order; only publish the contiguous run from frame 0."""
+    frames = []
+    while len(frames) in slots:
+        frames.append(slots[len(frames)])
+    return frames
+
+async def refine_analysis(analysis: "asyncio.Task", doc_ref: firestore.DocumentReference) -> bool:
+    """
+    Swaps the provisional analysis for the LLM's once it lands; the slug (dream id) stays.
+    A failure is recorded as analysis_status FAILED, which resume_dream retries. Returns
+    whether the hex was refined.
+    """
+    try:
+        refined = await analysis
+    except Exception as e:
+        print(f"⚠️ LLM analysis failed, keeping the provisional hex: {e}")
+        doc_ref.update({"analysis_source": "provisional", "analysis_status": "FAILED", "analysis_error": str(e)})
+        return False
+    doc_ref.update({
+        "hex.title": refined.hex.title,
+        "hex.description_360": refined.hex.description_360,
+        "hex.central_imagery": refined.hex.central_imagery,
+        "hex.stations": [s.dict() for s in refined.hex.stations],
+        "summary_short": refined.summary_short,
+        "summary_long": refined.summary_long,
+        "entities": refined.entities,
+        "analysis_source": "llm",
+        "analysis_status": "COMPLETE",
+        "analysis_error": None
+    })
+    print(f"    ✍️ Analysis refined for {doc_ref.id}")
+    return True
+
+def background_complete(hex_data: dict) -> bool:
+    if level_key(1) in hex_data.get("background_levels", {}):
+        return True
+    if "background_status" in hex_data:
+        # Streamed frames of an unfinished background don't count
+        return hex_data["background_status"] == "COMPLETE"
+    # Dreams from before per-asset tracking only have their frames
+    return bool(hex_data.get("background_frames"))
+
+async def waterfall_generation(dream_data: dict[str, Any], doc_ref: firestore.DocumentReference, analysis: Optional["asyncio.Task"] = None):
+    """
+    Background, then stations. With `analysis` (an LLM analysis still running),
+    the background renders from the provisional description meanwhile and
+    the stations wait for the refined hex; if the analysis fails the dream
+    stops in ERROR after the background. Pieces already COMPLETE (a resumed
+    dream) are skipped; a failure marks only the pieces in flight FAILED.
+    """
+    pano_painter = get_painter_instance("pano")
+    sprite_painter = get_painter_instance("sprite")
+    if not pano_painter or not sprite_painter:
+        if analysis: await refine_analysis(analysis, doc_ref)
+        return
 
     slug = dream_data["hex"]["slug"]
     stations = dream_data["hex"]["stations"]
-    
-    frame_count_bg = 2 if TEST_MODE else 3
-    frame_count_sprite = 2 if TEST_MODE else 4
-    
-    print(f"🌊 Starting Waterfall for {slug} (TestMode={TEST_MODE})")
-
+    bg_done = background_complete(dream_data["hex"])
+    done = set()  # station ids this run finished
+    # The sprite pool scales to zero; boot it while the background renders
+    if any(s["entity_name"] and s.get("asset_status") != "COMPLETE" for s in stations):
+        WARMUP.ensure_warm("sprite")
+    stage = "background"
+    refined = True
+    s_ids = []
+    acquired = False
     try:
-        # STEP 1: BACKGROUND
-        print("    1. Generating Background...")
-        bg_urls = await painter.generate_frames.remote.aio(
-            prompt_a=dream_data["hex"]["description_360"], 
-            prompt_b=None, 
-            type="pano", 
-            frames=frame_count_bg, 
-            path_prefix=f"{slug}/background/bg"
-        )
-        
+        tier_name = QUALITY.acquire(backlog=len(stance_queue.items) + len(level_queue.items))
+        acquired = True
+        tier = TIERS[tier_name]
+        print(f"🌊 Starting Waterfall for {slug} (tier={tier_name})")
+
         doc_ref.update({
-            "hex.background_frames": bg_urls,
-            "status": "GENERATING_ENTITIES" 
+            "quality_tier": tier_name,
+            "waterfall_at": firestore.SERVER_TIMESTAMP,
+            "heartbeat_at": firestore.SERVER_TIMESTAMP,
+            "hex.background_status": "COMPLETE" if bg_done else "GENERATING"
         })
-        
+
+        # STEP 1: BACKGROUND
+        if bg_done:
+            print("    1. Background already complete, skipping")
+            if analysis: refined = await refine_analysis(analysis, doc_ref)
+            doc_ref.update({"status": "GENERATING_ENTITIES"})
+        else:
+            print("    1. Generating Background...")
+            bg_job = {
+                "prompt_a": dream_data["hex"]["description_360"],
+                "prompt_b": None,
+                "type": "pano",
+                "frames": tier["bg_frames"],
+                "width": tier["pano_size"][0],
+                "height": tier["pano_size"][1],
+                "path_prefix": f"{slug}/background/bg",
+                "video": BG_VIDEO_CODEC,
+                "tiles": BG_TILE_LAYOUT,
+                "preview": True
+            }
+            # Stream so the blurred preview of frame 0, then each finished frame, land on the doc early
+            bg_slots = {}
+            def on_bg_event(event):
+                if event["type"] == "preview":
+                    doc_ref.update({"hex.background_preview": event["preview"]})
+                elif event["type"] == "frame":
+                    print(f"       bg frame {event['index']} ready (gen {event['gen_s']}s, upload {event['upload_s']}s)")
+                    bg_slots[event["index"]] = event["urls"]["full"]
+                    doc_ref.update({"hex.background_frames": ready_prefix(bg_slots), "heartbeat_at": firestore.SERVER_TIMESTAMP})
+
+            if analysis:
+                bg_assets, refined = await asyncio.gather(
+                    stream_batch(pano_painter, [bg_job], on_bg_event),
+                    refine_analysis(analysis, doc_ref)
+                )
+            else:
+                bg_assets = await stream_batch(pano_painter, [bg_job], on_bg_event)
+            bg_asset = bg_assets[0]
+
+            doc_ref.update({
+                **level_fields(level_asset(bg_asset)),
+                f"hex.background_levels.{level_key(1)}": level_asset(bg_asset),
+                "hex.background_status": "COMPLETE",
+                "hex.chaos_level": 1,
+                "status": "GENERATING_ENTITIES",
+                "heartbeat_at": firestore.SERVER_TIMESTAMP
+            })
+
+        if not refined:
+            # Stations from the provisional hex would be thrown away by the refined one
+            stage = "analysis"
+            raise RuntimeError("LLM analysis failed, stations wait for a resume")
+
+        stage = "stations"
         dream_data = doc_ref.get().to_dict()
         stations = dream_data["hex"]["stations"]
 
         # STEP 2: STATIONS
-        active_stations = [s for s in stations if s["entity_name"]]
-        if TEST_MODE: active_stations = active_stations[:1]
-
-        for station_data in active_stations:
-            print(f"    2. Generating Station: {station_data['entity_name']}...")
-            s_idx = next(i for i, s in enumerate(stations) if s["id"] == station_data["id"])
-            
-            sprite_urls = await painter.generate_frames.remote.aio(
-                prompt_a=station_data["state_start"], 
-                prompt_b=station_data["state_end"],
-                type="sprite", 
-                frames=frame_count_sprite, 
-                path_prefix=f"{slug}/stations/{station_data['id']}/frame"
-            )
-            
-            stations[s_idx]["sprite_frames"] = sprite_urls
-            stations[s_idx]["asset_status"] = "COMPLETE"
-
-            doc_ref.update({"hex.stations": stations})
+        # Stations finished by an earlier run are kept; the tier caps how many of
+        # the rest render now, and the others stay PENDING for a later resume
+        active_stations = [s for s in stations if s["entity_name"] and s.get("asset_status") != "COMPLETE"][:tier["stations"]]
+
+        # Frame k of every sprite runs as one batched pipe call on the worker
+        print(f"    2. Generating {len(active_stations)} Stations (batched)...")
+        jobs = [{
+            "prompt_a": station_data["state_start"],
+            "prompt_b": station_data["state_end"],
+            "type": "sprite",
+            "frames": tier["sprite_frames"],
+            "width": tier["sprite_size"][0],
+            "height": tier["sprite_size"][1],
+            "path_prefix": f"{slug}/stations/{station_data['id']}/frame"
+        } for station_data in active_stations]
+
+        if SPRITE_ATLAS:
+            for job, station_data in zip(jobs, active_stations):
+                job["atlas"] = f"{slug}/stations/{station_data['id']}/atlas"
+                job["variant"] = normalize_stance(station_data.get("current_stance", "idle"))
+
+        if jobs:
+            s_ids = [st["id"] for st in active_stations]
+            sprite_slots = [{} for _ in jobs]
+
+            def on_sprite_event(event):
+                if event["type"] != "frame": return
+                j = event["job"]
+                sprite_slots[j][event["index"]] = event["urls"]["full"]
+                update_stations(doc_ref, {s_ids[j]: {"sprite_frames": ready_prefix(sprite_slots[j]), "asset_status": "GENERATING"}},
+                                {"heartbeat_at": firestore.SERVER_TIMESTAMP})
+
+            assets = await stream_batch(sprite_painter, jobs, on_sprite_event)
+
+            changes = {}
+            for station_data, asset in zip(active_stations, assets):
+                stance = normalize_stance(station_data.get("current_stance", "idle"))
+                entry = stance_entry(asset)
+                changes[station_data["id"]] = {**stance_fields(entry), "stance_assets": {stance: entry}, "asset_status": "COMPLETE"}
+            update_stations(doc_ref, changes)
+            done.update(changes)
 
         # STEP 3: FINALIZE
-        doc_ref.update({"status": "COMPLETE"})
-        print(f"✅ Waterfall Complete for {slug}")
+        # Stations past the tier's cap are still PENDING; DEGRADED keeps the dream
+        # resumable, so the bulk resume renders them once the pools calm down
+        deferred = [s for s in stations if s["entity_name"] and s.get("asset_status") != "COMPLETE" and s["id"] not in done]
+        doc_ref.update({"status": "DEGRADED" if deferred else "COMPLETE"})
+        if deferred:
+            print(f"🪫 Waterfall for {slug} done at tier {tier_name}, {len(deferred)} stations deferred")
+        else:
+            print(f"✅ Waterfall Complete for {slug}")
+
+        # The first aggressive stance moves the scene to level 2; have it ready
+        if queue_level(doc_ref.id, doc_ref.get().to_dict()["hex"], 2):
+            await level_queue.drain()
 
     except Exception as e:
-        print(f"❌ Error in waterfall: {e}")
-        doc_ref.update({"status": "ERROR"})
+        print(f"❌ Error in waterfall ({stage}): {e}")
+        update = {"status": "ERROR"}
+        if stage == "background":
+            update["hex.background_status"] = "FAILED"
+        if s_ids:
+            update_stations(doc_ref, {sid: {"asset_status": "FAILED"} for sid in s_ids if sid not in done}, update)
+        else:
+            doc_ref.update(update)
+    finally:
+        if acquired:
+            QUALITY.release()
+
+# --- OFF-PATH RENDERS ---
+class RenderQueue:
+    """
+    Deduped, batched renders on one painter pool, kept off the request path.
+    Callers add jobs and schedule drain() as a background task; a drain already
+    running picks up whatever was queued after it started.
+    """
+
+    def __init__(self, job_type: str, save, batch: int):
+        self.job_type = job_type
+        self.save = save  # save(key, asset)
+        self.batch = batch
+        self.items: List[Dict[str, Any]] = []
+        self.inflight = set()
+        self.lock = asyncio.Lock()
+
+    def add(self, key: tuple, job: dict) -> bool:
+        if key in self.inflight: return False
+        self.inflight.add(key)
+        self.items.append({"key": key, "job": job})
+        return True
+
+    async def drain(self):
+        if self.lock.locked(): return
+        async with self.lock:
+            painter = get_painter_instance(self.job_type)
+            while self.items:
+                batch = self.items[:self.batch]
+                del self.items[:self.batch]
+                try:
+                    if not painter: raise RuntimeError(f"{self.job_type} painter unavailable")
+                    async with WARMUP.track(self.job_type):
+                        assets = await painter.generate_batch.remote.aio([item["job"] for item in batch])
+                    for item, asset in zip(batch, assets):
+                        self.save(item["key"], asset)
+                    print(f"🖌️ Rendered {len(batch)} {self.job_type} jobs off-path")
+                except Exception as e:
+                    print(f"❌ Off-path {self.job_type} render failed: {e}")
+                finally:
+                    for item in batch:
+                        self.inflight.discard(item["key"])
+
+# --- STANCE ASSETS ---
+# Stances missing from a station's stance_assets are queued by interact and
+# rendered on the sprite pool.
+STANCE_BATCH = 8
+
+def normalize_stance(stance: str) -> str:
+    stance = (stance or "").strip().lower()
+    return stance if stance in dream_analyzer.STANCE_KEYS else "idle"
+
+def stance_job(slug: str, station: dict, stance: str) -> dict:
+    name = station.get("entity_name") or "entity"
+    job = {
+        "prompt_a": f"{name}, {stance}",
+        "prompt_b": f"{name}, {stance}, {station.get('state_end') or ''}",
+        "type": "sprite",
+        "frames": 2 if TEST_MODE else 4,
+        "path_prefix": f"{slug}/stations/{station['id']}/{stance}/frame"
+    }
+    if SPRITE_ATLAS:
+        # One sheet per stance: the worker packs only the variants of a single call
+        job["atlas"] = f"{slug}/stations/{station['id']}/{stance}/atlas"
+        job["variant"] = stance
+    return job
+
+def stance_entry(asset: dict) -> dict:
+    """A stance_assets entry: frame urls, or an atlas sheet plus the variant to play."""
+    entry = {"frames": asset["frames"], "tiers": asset["tiers"]}
+    if asset.get("atlas"):
+        entry.update(atlas=asset["atlas"], variant=asset.get("variant"))
+    return entry
+
+def stance_ready(entry: Optional[dict]) -> bool:
+    return bool(entry and (entry.get("frames") or entry.get("atlas")))
+
+def stance_fields(entry: dict) -> dict:
+    """The station fields that display one stance; atlas entries leave the frame urls alone."""
+    if entry.get("atlas"):
+        return {"sprite_atlas": entry["atlas"], "sprite_variant": entry.get("variant")}
+    return {"sprite_frames": entry["frames"], "sprite_tiers": entry.get("tiers", {})}
+
+def update_stations(doc_ref: firestore.DocumentReference, changes: Dict[str, dict], extra: Optional[dict] = None):
+    """
+    Transactional read-modify-write of hex.stations: merges `changes`
+    ({station_id: fields}) into the stored stations, so the waterfall and the
+    stance drains can't drop each other's writes. stance_assets merge per stance.
+    """
+    @firestore.transactional
+    def apply(transaction):
+        snap = doc_ref.get(transaction=transaction)
+        if not snap.exists: return
+        stations = snap.to_dict()["hex"].get("stations", [])
+        for s in stations:
+            for field, value in changes.get(s["id"], {}).items():
+                if field == "stance_assets":
+                    s.setdefault("stance_assets", {}).update(value)
+                else:
+                    s[field] = value
+        transaction.update(doc_ref, {"hex.stations": stations, **(extra or {})})
+
+    apply(get_db().transaction())
+
+def save_stance_asset(key: tuple, asset: dict):
+    dream_id, station_id, stance = key
+    doc_ref = get_db().collection("dreams").document(dream_id)
+    update_stations(doc_ref, {station_id: {"stance_assets": {stance: stance_entry(asset)}}})
+
+stance_queue = RenderQueue("sprite", save_stance_asset, STANCE_BATCH)
+
+# --- CHAOS LEVELS ---
+# Background condition levels, as in scripts/world_builder.py. Level 1 is the
+# waterfall's background; higher levels render off-path, one step ahead of
+# the interaction state, so switching scenes never waits on the GPU.
+LEVEL_BATCH = 2
+
+def level_key(level: int) -> str:
+    return f"level_{level}"
+
+def chaos_level_for(station_stances: Dict[str, str]) -> int:
+    """1 + one level per station in an aggressive stance, capped at the top level."""
+    aggressive = sum(stance in dream_analyzer.AGGRESSIVE_STANCES for stance in station_stances.values())
+    return min(max(dream_analyzer.CHAOS_LEVELS), 1 + aggressive)
+
+def level_asset(asset: dict) -> dict:
+    return {"frames": asset["frames"], "tiers": asset["tiers"], "video": asset.get("video"), "tiles": asset.get("tiles")}
+
+def level_fields(level_data: dict) -> dict:
+    """The hex.background_* fields that display one level."""
+    return {
+        "hex.background_frames": level_data["frames"],
+        "hex.background_tiers": level_data.get("tiers", {}),
+        "hex.background_video": level_data.get("video"),
+        "hex.background_tiles": level_data.get("tiles"),
+    }
+
+def level_job(hex_data: dict, level: int) -> dict:
+    return {
+        "prompt_a": f"{hex_data['description_360']}, {dream_analyzer.CHAOS_LEVELS[level]}",
+        "prompt_b": None,
+        "type": "pano",
+        "frames": 2 if TEST_MODE else 3,
+        "path_prefix": f"{hex_data['slug']}/background/{level_key(level)}/bg",
+        "video": BG_VIDEO_CODEC,
+        "tiles": BG_TILE_LAYOUT
+    }
+
+def save_background_level(key: tuple, asset: dict):
+    dream_id, level = key
+    doc_ref = get_db().collection("dreams").document(dream_id)
+    data = level_asset(asset)
+    update = {f"hex.background_levels.{level_key(level)}": data}
+    # Show it right away if interaction moved to this level while it rendered
+    snap = doc_ref.get()
+    if snap.exists and snap.get("hex.chaos_level") == level:
+        update.update(level_fields(data))
+    doc_ref.update(update)
+
+level_queue = RenderQueue("pano", save_background_level, LEVEL_BATCH)
+
+def stored_levels(hex_data: dict) -> Dict[str, dict]:
+    """hex.background_levels, plus level 1 from background_* for dreams rendered before levels existed."""
+    levels = dict(hex_data.get("background_levels", {}))
+    if level_key(1) not in levels and hex_data.get("chaos_level", 1) == 1 and background_complete(hex_data):
+        levels[level_key(1)] = {
+            "frames": hex_data["background_frames"],
+            "tiers": hex_data.get("background_tiers", {}),
+            "video": hex_data.get("background_video"),
+            "tiles": hex_data.get("background_tiles"),
+        }
+    return levels
+
+def queue_level(dream_id: str, hex_data: dict, level: int) -> bool:
+    """Queues `level` unless it is level 1 (the waterfall owns it), out of range or already rendered."""
+    if level <= 1 or level not in dream_analyzer.CHAOS_LEVELS or level_key(level) in hex_data.get("background_levels", {}):
+        return False
+    return level_queue.add((dream_id, level), level_job(hex_data, level))
+
+# --- RESUME ---
+# A failed or interrupted waterfall leaves per-asset status behind
+# (hex.background_status, each station's asset_status). Resuming re-runs the
+# waterfall, which skips every COMPLETE piece, so only the missing ones hit the GPU.
+# DEGRADED dreams finished with stations deferred by the quality tier.
+RESUMABLE_STATUSES = ["ERROR", "DEGRADED", "ANALYSIS_COMPLETE", "GENERATING_ENTITIES"]
+RESUME_BACKOFF_S = 10
+_resuming = set()
+
+def missing_assets(dream_data: dict) -> List[str]:
+    hex_data = dream_data["hex"]
+    # A failed LLM analysis is retried from the stored report text
+    missing = ["analysis"] if dream_data.get("analysis_status") == "FAILED" and dream_data.get("report_text") else []
+    missing += [] if background_complete(hex_data) else ["background"]
+    missing += [f"station:{s['id']}" for s in hex_data.get("stations", [])
+                if s.get("entity_name") and s.get("asset_status") != "COMPLETE"]
+    return missing
+
+async def resume_dream(doc_ref: firestore.DocumentReference, dream_data: dict):
+    try:
+        hex_data = dream_data["hex"]
+        missing = missing_assets(dream_data)
+        if not missing:
+            doc_ref.update({"status": "COMPLETE"})
+            return
+        analysis = None
+        if "analysis" in missing:
+            analysis = asyncio.create_task(dream_analyzer.analyze_dream_text(dream_data["report_text"], user_id=dream_data.get("owner_id")))
+        # Failed and half-streamed pieces start over; finished ones stay
+        for s in hex_data.get("stations", []):
+            if s.get("asset_status") != "COMPLETE":
+                s["asset_status"] = "PENDING"
+        dream_data["status"] = "GENERATING_ENTITIES" if background_complete(hex_data) else "ANALYSIS_COMPLETE"
+        doc_ref.update({"status": dream_data["status"], "hex.stations": hex_data.get("stations", [])})
+        print(f"♻️ Resuming {doc_ref.id}: {', '.join(missing)}")
+        await waterfall_generation(dream_data, doc_ref, analysis)
+    finally:
+        _resuming.discard(doc_ref.id)
+
+def find_stuck_dreams(stuck_after_s: int, limit: int) -> List[Any]:
+    """ERROR and DEGRADED dreams, and in-progress ones whose waterfall went quiet over stuck_after_s ago."""
+    now = time.time()
+    stuck = []
+    for snap in get_db().collection("dreams").where("status", "in", RESUMABLE_STATUSES).stream():
+        data = snap.to_dict()
+        # Every frame and station write refreshes heartbeat_at, so a long healthy run stays fresh.
+        # A fresh submission may not have reached the waterfall yet; it counts from its creation.
+        last_beat = data.get("heartbeat_at") or data.get("waterfall_at") or data.get("created_at") or snap.create_time
+        if snap.id in _resuming:
+            continue
+        if data["status"] not in ("ERROR", "DEGRADED") and last_beat and now - last_beat.timestamp() < stuck_after_s:
+            continue
+        stuck.append(snap)
+        if len(stuck) >= limit:
+            break
+    return stuck
+
+async def resume_many(snaps: List[Any], concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(snap):
+        async with gate:
+            # Live submissions come first: hold back while the GPU pools are under pressure
+            while QUALITY.pressure() > 0:
+                await asyncio.sleep(RESUME_BACKOFF_S)
+            try:
+                await resume_dream(snap.reference, snap.to_dict())
+            except Exception as e:
+                print(f"❌ Resume of {snap.id} failed: {e}")
+
+    await asyncio.gather(*(one(snap) for snap in snaps))
+    print(f"♻️ Bulk resume finished ({len(snaps)} dreams)")
 
 # --- ENDPOINTS ---
 
@@ -161,25 +624,92 @@ def get_random_music():
         print(f"Error fetching music: {e}")
         return {"url": None}
 
+# --- WORLD MANIFEST ---
+_world_index = {"body": None, "etag": None, "fetched": 0.0}
+_world_shards: Dict[str, bytes] = {}
+# Sync endpoints run on the threadpool; eviction must not race
+_world_shards_lock = threading.Lock()
+
+def read_world_blob(path: str) -> bytes:
+    return get_storage().bucket(GCS_BUCKET).blob(path).download_as_bytes()
+
+@app.get("/world/index")
+def get_world_index(request: Request):
+    if _world_index["body"] is None or time.time() - _world_index["fetched"] > WORLD_INDEX_TTL:
+        try:
+            body = read_world_blob(world_shards.index_path())
+            _world_index.update(body=body, etag=f'"{world_shards.content_hash(body)}"', fetched=time.time())
+        except NotFound:
+            raise HTTPException(404, "World index not published")
+        except Exception as e:
+            # Serve the last good index rather than failing app startup
+            if _world_index["body"] is None: raise HTTPException(503, "World index unavailable")
+            print(f"⚠️ World index refresh failed, serving cached copy: {e}")
+
+    headers = {"ETag": _world_index["etag"], "Cache-Control": f"public, max-age={WORLD_INDEX_TTL}"}
+    if request.headers.get("if-none-match") == _world_index["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(_world_index["body"], media_type="application/json", headers=headers)
+
+@app.get("/world/shards/{name}")
+def get_world_shard(name: str):
+    if not world_shards.SHARD_NAME.match(name):
+        raise HTTPException(400, "Invalid shard name")
+    body = _world_shards.get(name)
+    if body is None:
+        try:
+            body = read_world_blob(world_shards.shard_path(name))
+        except NotFound:
+            raise HTTPException(404, "Shard not found")
+        with _world_shards_lock:
+            if len(_world_shards) >= WORLD_SHARD_CACHE:
+                _world_shards.pop(next(iter(_world_shards)), None)
+            _world_shards[name] = body
+    headers = {"ETag": f'"{name.split(".")[1]}"', "Cache-Control": SHARD_CACHE_CONTROL}
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/metrics")
+def get_metrics():
+    policies = [dream_analyzer.ANALYSIS_POLICY, dream_analyzer.INTERACTION_POLICY]
+    return {
+        "llm_usage": LEDGER.snapshot(),
+        "llm_policy": {p.name: {**p.stats, "p95_ms": round(1000 * p.p95()) if p.p95() else None} for p in policies},
+        "quality": QUALITY.snapshot(),
+        "gpu_warmup": WARMUP.snapshot(),
+    }
+
 @app.post("/warmup")
 async def warmup_gpu(req: WarmupRequest):
     user_log = req.user_id if req.user_id else "ANONYMOUS" 
-    print(f"🔥 Warmup requested by {user_log}")
-    painter = get_painter_instance()
-    if painter:
-        painter.wake_up.remote()
-    return {"status": "warming"}
+    pools = WARMUP.request()
+    print(f"🔥 Warmup requested by {user_log}: {pools}")
+    return {"status": "warm" if all(p == "warm" for p in pools.values()) else "warming", "pools": pools}
 
 @app.post("/dreams/report")
 async def submit_dream(req: DreamReport, bg_tasks: BackgroundTasks):
     db_client = get_db()
-    analysis = await dream_analyzer.analyze_dream_text(req.report_text)
-    dream_id = analysis.hex.slug
+    WARMUP.note_submission()
+    # Budget is checked up front; the LLM call itself runs after the response, on the admitted model
+    try:
+        model = await LEDGER.admit("analyze_dream", req.user_id)
+    except BudgetExceeded as e:
+        print(f"🛑 {req.user_id}: {e}")
+        raise HTTPException(429, "The dream well is dry for today. Come back tomorrow.")
+
+    # Phase 1: provisional hex from the local analyzer, so the dream id and the
+    # background render don't wait on the LLM. Phase 2 refines it in the waterfall.
+    provisional = dream_analyzer.DreamGenerationResponse(**quick_analyzer.provisional_analysis(req.report_text, salt=req.user_id))
+    dream_id = provisional.hex.slug
     
-    doc = analysis.dict()
+    doc = provisional.dict()
     doc["id"] = dream_id
     doc["owner_id"] = req.user_id
     doc["status"] = "ANALYSIS_COMPLETE" 
+    doc["analysis_source"] = "provisional"
+    doc["analysis_status"] = "PENDING"
+    doc["created_at"] = datetime.now(timezone.utc)
+    # Kept so a failed LLM analysis can be retried by resume
+    doc["report_text"] = req.report_text
     doc["hex"]["background_frames"] = [] 
     
     doc_ref = db_client.collection("dreams").document(dream_id)
@@ -191,7 +721,8 @@ async def submit_dream(req: DreamReport, bg_tasks: BackgroundTasks):
     except:
         user_ref.set({"unlocked_dreams": [dream_id]})
     
-    bg_tasks.add_task(waterfall_generation, doc, doc_ref)
+    analysis = asyncio.create_task(dream_analyzer.analyze_dream_text(req.report_text, user_id=req.user_id, model=model))
+    bg_tasks.add_task(waterfall_generation, doc, doc_ref, analysis)
     return doc
 
 @app.get("/dreams/list")
@@ -212,7 +743,7 @@ def list_dreams(user_id: str):
                 "title": data["hex"]["title"],
                 "description": data.get("summary_short", "Dream analyzed."),
                 "status": data["status"],
-                "thumbnail": data["hex"]["background_frames"][0] if data["hex"].get("background_frames") else None
+                "thumbnail": data["hex"]["background_frames"][0] if data["hex"].get("background_frames") else data["hex"].get("background_preview")
             })
     return results
 
@@ -223,18 +754,33 @@ async def interact(req: InteractionRequest, bg_tasks: BackgroundTasks):
     
     station = req.station_data
     world_context = req.world_context
+    dream_ref = db_client.collection("dreams").document(req.dream_id)
     
     old_stance = station.get("current_stance", "idle")
     old_greeting = station.get("entity_greeting", "")
 
-    # Analyze Interaction with rich context
-    rx = await dream_analyzer.analyze_interaction_text(
-        world_context,
-        station.get("entity_name", "Unknown"), 
-        old_stance,
-        req.user_command
-    )
-    print(f"    -> New Stance: {rx.new_stance}, Unlock Trigger: {rx.unlock_trigger}")
+    # Analyze Interaction with rich context. The stored dream (and its stance index)
+    # is read on a thread while the LLM call runs, so it adds no latency.
+    try:
+        dream_snap, rx = await asyncio.gather(
+            asyncio.to_thread(dream_ref.get),
+            dream_analyzer.analyze_interaction_text(
+                world_context,
+                station.get("entity_name", "Unknown"), 
+                old_stance,
+                req.user_command,
+                user_id=req.user_id,
+                dream_id=req.dream_id
+            )
+        )
+    except BudgetExceeded as e:
+        print(f"🛑 {req.user_id}: {e}")
+        raise HTTPException(429, "The dream grows quiet. Come back tomorrow.")
+    except LLMCallFailed as e:
+        print(f"❌ {e}")
+        raise HTTPException(503, "The dream is slow to answer. Try again.")
+    new_stance = normalize_stance(rx.new_stance)
+    print(f"    -> New Stance: {new_stance}, Unlock Trigger: {rx.unlock_trigger}")
     
     # Update Station Data
     station.update({
@@ -243,8 +789,51 @@ async def interact(req: InteractionRequest, bg_tasks: BackgroundTasks):
         "entity_greeting": rx.new_greeting,
         "entity_monologue": rx.entity_monologue, # NEW
         "interaction_options": rx.new_options,
-        "current_stance": rx.new_stance
+        "current_stance": new_stance
     })
+
+    # Serve the new stance's frames from the index; no GPU call on this path
+    stored = {}
+    if dream_snap.exists:
+        stored = next((s for s in dream_snap.to_dict()["hex"].get("stations", []) if s["id"] == req.station_id), {})
+    stance_assets = {**station.get("stance_assets", {}), **stored.get("stance_assets", {})}
+    station["stance_assets"] = stance_assets
+    if stance_ready(stance_assets.get(new_stance)):
+        station.update(stance_fields(stance_assets[new_stance]))
+        station["stance_pending"] = False
+    elif dream_snap.exists:
+        # Keep the current frames for now; the client picks the stance up on its next fetch
+        key = (req.dream_id, req.station_id, new_stance)
+        if stance_queue.add(key, stance_job(dream_snap.get("hex.slug"), {**stored, **station}, new_stance)):
+            bg_tasks.add_task(stance_queue.drain)
+        station["stance_pending"] = True
+
+    # Chaos level follows the stations' stances; switch to it if it's rendered
+    # and keep the level above it rendering, so the next switch is instant too
+    background = None
+    if dream_snap.exists:
+        hex_data = dream_snap.to_dict()["hex"]
+        station_stances = {**hex_data.get("station_stances", {}), req.station_id: new_stance}
+        level = chaos_level_for(station_stances)
+        levels = stored_levels(hex_data)
+        level_data = levels.get(level_key(level))
+        update = {
+            firestore.FieldPath("hex", "station_stances", req.station_id).to_api_repr(): new_stance,
+            "hex.chaos_level": level
+        }
+        # Keep an older dream's background as level 1 before another level replaces background_*
+        if level_key(1) in levels and level_key(1) not in hex_data.get("background_levels", {}):
+            update[f"hex.background_levels.{level_key(1)}"] = levels[level_key(1)]
+        if level_data and level != hex_data.get("chaos_level", 1):
+            update.update(level_fields(level_data))
+        queued = [queue_level(req.dream_id, hex_data, l) for l in (level, level + 1)]
+        if any(queued):
+            bg_tasks.add_task(level_queue.drain)
+        try:
+            dream_ref.update(update)
+        except Exception as e:
+            print(f"⚠️ Failed to update chaos level: {e}")
+        background = {"chaos_level": level, "level": level_data, "pending": level_data is None}
     
     # Log to 'interaction' collection
     interaction_log = {
@@ -252,7 +841,7 @@ async def interact(req: InteractionRequest, bg_tasks: BackgroundTasks):
         "action_text": req.user_command,
         "target_station_id": req.station_id,
         "old_stance": old_stance,
-        "new_stance": rx.new_stance,
+        "new_stance": new_stance,
         "old_greeting": old_greeting,
         "new_greeting": rx.new_greeting,
         "monologue": rx.entity_monologue,
@@ -267,7 +856,8 @@ async def interact(req: InteractionRequest, bg_tasks: BackgroundTasks):
 
     return {
         "station": station, 
-        "unlock": rx.unlock_trigger is not None
+        "unlock": rx.unlock_trigger is not None,
+        "background": background
     }
 
 @app.delete("/dreams/{dream_id}")
@@ -296,13 +886,51 @@ async def reprocess_dream(dream_id: str, req: DreamAction, bg_tasks: BackgroundT
     dream_data = doc.to_dict()
     dream_data["status"] = "ANALYSIS_COMPLETE" 
     dream_data["hex"]["background_frames"] = [] 
+    dream_data["hex"]["background_status"] = "PENDING"
+    dream_data["hex"]["background_tiers"] = {}
+    dream_data["hex"]["background_video"] = None
+    dream_data["hex"]["background_preview"] = None
+    dream_data["hex"]["background_tiles"] = None
+    dream_data["hex"]["background_levels"] = {}
+    dream_data["hex"]["chaos_level"] = 1
+    dream_data["hex"]["station_stances"] = {}
     
     if "stations" in dream_data["hex"]:
         for s in dream_data["hex"]["stations"]:
             s["sprite_frames"] = []
+            s["sprite_tiers"] = {}
+            s["sprite_atlas"] = None
+            s["sprite_variant"] = None
+            s["stance_assets"] = {}
             s["asset_status"] = "PENDING"
         
     doc_ref.set(dream_data)
     bg_tasks.add_task(waterfall_generation, dream_data, doc_ref)
     
-    return {"status": "requeued", "message": f"Dream {dream_id} reset and generation started."}
\ No newline at end of file
+    return {"status": "requeued", "message": f"Dream {dream_id} reset and generation started."}
+
+@app.post("/dreams/resume/{dream_id}")
+async def resume_dream_assets(dream_id: str, req: DreamAction, bg_tasks: BackgroundTasks):
+    """Regenerates only the missing or failed assets; /dreams/reprocess starts over."""
+    doc_ref = get_db().collection("dreams").document(dream_id)
+    doc = doc_ref.get()
+    if not doc.exists:
+        raise HTTPException(404, "Dream not found")
+    if dream_id in _resuming:
+        return {"status": "resuming", "missing": None}
+
+    dream_data = doc.to_dict()
+    _resuming.add(dream_id)
+    bg_tasks.add_task(resume_dream, doc_ref, dream_data)
+    return {"status": "resuming", "missing": missing_assets(dream_data)}
+
+@app.post("/admin/dreams/resume")
+async def resume_stuck_dreams(req: ResumeRequest, bg_tasks: BackgroundTasks, x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(403, "Forbidden")
+    snaps = find_stuck_dreams(req.stuck_after_s, req.limit)
+    missing = {snap.id: missing_assets(snap.to_dict()) for snap in snaps}
+    if not req.dry_run and snaps:
+        _resuming.update(missing)
+        bg_tasks.add_task(resume_many, snaps, max(1, req.concurrency))
+    return {"status": "dry_run" if req.dry_run else "resuming", "count": len(snaps), "missing": missing}
@@ -1,7 +1,14 @@
 import modal
-import io
 import os
 import json
+import queue
+import threading
+import time
+
+import frame_batcher
+from conv_padding import PaddingLock
+import image_encoding
+from upload_pipeline import UploadPipeline, public_url, upload_bytes
 
 # --- APP DEFINITION ---
 app = modal.App("dreamhex-worker")
@@ -9,6 +16,7 @@ app = modal.App("dreamhex-worker")
 # --- CONFIG ---
 GPU_CONFIG = "T4" 
 MODEL_ID = "stabilityai/sdxl-turbo"
+MATTING_MODEL = "u2net" # "u2netp" is the fast tier: ~4x quicker, slightly softer edges
 
 # --- IMAGE DEFINITION ---
 def download_models():
@@ -21,27 +29,34 @@ def download_models():
         MODEL_ID, torch_dtype=torch.float16, variant="fp16"
     )
     print("💾 BUILD: Downloading RemBG...")
-    new_session("u2net")
+    new_session(MATTING_MODEL)
 
 image = (
     modal.Image.debian_slim()
     .apt_install("libgl1", "libglib2.0-0")
     .pip_install(
         "diffusers", "transformers", "accelerate", "safetensors", 
-        "rembg", "pillow", "google-cloud-storage", "onnxruntime-gpu", "torch"
+        "rembg", "pillow", "google-cloud-storage", "onnxruntime-gpu", "torch",
+        "imageio[ffmpeg]", "numpy"
     )
     .run_function(download_models)
+    .add_local_python_source("frame_batcher", "conv_padding", "upload_pipeline", "sprite_matting", "image_encoding", "sprite_atlas", "loop_video", "pano_tiles")
 )
 
-# --- WORKER CLASS ---
-@app.cls(gpu=GPU_CONFIG, image=image, secrets=[modal.Secret.from_name("gcp-credentials")], enable_memory_snapshot=True,scaledown_window=120,min_containers=1)
+# --- WORKER CLASSES ---
+# DreamPainter holds the shared logic. PanoPainter and SpritePainter are the
+# deployed pools: each fixes its conv padding once at boot, so a container
+# never flips padding between calls and never renders the other type.
 class DreamPainter:
+    JOB_TYPE = "sprite"
+
     def __init__(self):
         self.pipe = None 
         self.rembg = None
         self.bucket = None
         self.storage = None
         self.bucket_name = None 
+        self.padding = PaddingLock(self.JOB_TYPE)
 
     @modal.enter()
     def setup(self):
@@ -62,7 +77,8 @@ class DreamPainter:
             local_files_only=True 
         )
         self.pipe.to("cuda")
-        self.rembg = new_session("u2net")
+        self.padding.apply(self.pipe.unet, self.pipe.vae)
+        self.rembg = new_session(MATTING_MODEL) if self.JOB_TYPE == "sprite" else None
         
         # GCP Setup
         creds_val = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
@@ -91,80 +107,209 @@ class DreamPainter:
             print("⚠️ Upload failed: Storage client or bucket not initialized.")
             return "error_url"
             
+        data, content_type = image_encoding.encode_image(image, path)
+        return upload_bytes(self.bucket, data, path, content_type)
+
+    def _upload_atlases(self, jobs, atlas_frames):
+        """Packs collected frames into one sheet per atlas path; returns {path: meta}."""
+        from sprite_atlas import pack_atlas
+
+        groups = {}
+        for j, job in enumerate(jobs):
+            if j in atlas_frames:
+                frames = [atlas_frames[j][i] for i in sorted(atlas_frames[j])]
+                groups.setdefault(job["atlas"], {})[job["variant"]] = frames
+
+        metas = {}
+        for path, frames_by_variant in groups.items():
+            sheet, meta = pack_atlas(frames_by_variant)
+            ext = image_encoding.resolve_format("webp")
+            meta["url"] = self._upload(sheet, f"{path}.{ext}")
+            metas[path] = meta
+        return metas
+
+    def _upload_video(self, job, frames):
+        from loop_video import LOOP_FPS, encode_loop
+
         try:
-            # Use the pre-initialized self.bucket object
-            blob = self.bucket.blob(path) 
-            b = io.BytesIO()
-            fmt = "JPEG" if path.endswith('.jpg') else 'PNG' # Changed to ternary operator for consistency
-            image.save(b, format=fmt)
-            b.seek(0)
-            content_type = "image/jpeg" if fmt == "JPEG" else "image/png"
-            
-            # FIX: Removed predefined_acl='publicRead'
-            blob.upload_from_file(
-                b, 
-                content_type=content_type
-            )
-            
-            # Use the stored bucket name for the final URL
-            return f"https://storage.googleapis.com/{self.bucket_name}/{path}"
+            data, ext, content_type = encode_loop(frames, job["video"])
         except Exception as e:
-            print(f"❌ UPLOAD ERROR: {e}")
-            return "error_url_upload_exception"
-        
+            print(f"❌ VIDEO ERROR ({job['video']}): {e}")
+            return None
+        url = upload_bytes(self.bucket, data, f"{job['path_prefix']}_loop.{ext}", content_type)
+        return {"url": url, "codec": job["video"], "fps": LOOP_FPS, "keyframes": len(frames), "bytes": len(data)}
+
+    def _tile_renditions(self, job, index, image):
+        """Cubemap/equirect tiles of one pano frame, uploaded alongside its tiers."""
+        from pano_tiles import tile_set
+
+        tiles, _ = tile_set(image, job["tiles"])
+        out = []
+        for rel, tile in tiles:
+            path = f"{job['path_prefix']}_{index}_tiles/{rel}.jpg"
+            data, content_type = image_encoding.encode_image(tile, path)
+            out.append((f"tile:{rel}", path, data, content_type))
+        return out
+
+    def _tile_manifest(self, job):
+        from pano_tiles import describe_levels, tile_manifest
+
+        template = public_url(self.bucket, f"{job['path_prefix']}_{{frame}}_tiles/{{tile}}.jpg")
+        return tile_manifest(job["tiles"], describe_levels(job["tiles"]), template)
+
+    def _render_jobs(self, jobs, emit=None):
+        from PIL import Image
+        from sprite_matting import MaskPropagator
+
+        jobs = [frame_batcher.normalize_job(j) for j in jobs]
+        self.padding.check(jobs)
+        if not self.storage or not self.bucket:
+            print("⚠️ Upload failed: Storage client or bucket not initialized.")
+            return [{"frames": ["error_url"] * j["frames"], "tiers": {}, "format": j["format"]} for j in jobs]
+
+        for j, job in enumerate(jobs):
+            job["format"] = image_encoding.resolve_format(job["format"])
+            if job.get("atlas"):
+                job.setdefault("variant", str(j))
+
+        # One propagator per sprite: full rembg on frame 0, mask reuse while frames stay similar
+        mattes = {j: MaskPropagator(self.rembg) for j, job in enumerate(jobs) if job["type"] == "sprite"}
+        # Atlas jobs keep their matted frames in memory and upload one sheet instead
+        atlas_frames = {j: {} for j, job in enumerate(jobs) if job.get("atlas")}
+        # Video jobs keep frames too, for a looping clip next to the still fallbacks
+        video_frames = {j: {} for j, job in enumerate(jobs) if job.get("video")}
+
+        started = time.monotonic()
+
+        # GPU thread keeps generating; matting, encoding and uploads run on the pool
+        with UploadPipeline(self.bucket) as uploads:
+            def on_frame(j, i, out):
+                job = jobs[j]
+                if emit and i == 0 and job.get("preview"):
+                    emit({"type": "preview", "job": j, "preview": image_encoding.preview_data_uri(out)})
+
+                def render(img):
+                    if j in video_frames:
+                        video_frames[j][i] = img
+                    if j in atlas_frames:
+                        atlas_frames[j][i] = img
+                        return []
+                    out = image_encoding.renditions(
+                        img, job["path_prefix"], i, job["format"], job["tiers"], job["quality"]
+                    )
+                    if job.get("tiles"):
+                        out += self._tile_renditions(job, i, img)
+                    return out
+
+                future = uploads.submit(j, i, out, render, mattes.get(j))
+                if emit:
+                    generated_at = time.monotonic()
+
+                    def report(f):
+                        urls = f.result() if not f.exception() else {}
+                        if urls:
+                            emit({
+                                "type": "frame", "job": j, "index": i, "urls": urls,
+                                "gen_s": round(generated_at - started, 3),
+                                "upload_s": round(time.monotonic() - generated_at, 3)
+                            })
+
+                    future.add_done_callback(report)
+
+            frame_batcher.run_batches(
+                self.pipe, jobs, on_frame,
+                blank=lambda w, h: Image.new("RGB", (w, h), (128, 128, 128))
+            )
+            assets = []
+            for j, job in enumerate(jobs):
+                if j in atlas_frames:
+                    uploads.results(j)
+                    assets.append({"frames": [], "tiers": {}, "format": job["format"]})
+                else:
+                    assets.append({
+                        "frames": uploads.urls(j),
+                        "tiers": {t: uploads.urls(j, t) for t in job["tiers"] if t != "full"},
+                        "format": job["format"]
+                    })
+
+        if atlas_frames:
+            metas = self._upload_atlases(jobs, atlas_frames)
+            for j in atlas_frames:
+                assets[j]["atlas"] = metas[jobs[j]["atlas"]]
+                assets[j]["variant"] = jobs[j]["variant"]
+        for j, job in enumerate(jobs):
+            if job.get("tiles"):
+                assets[j]["tiles"] = self._tile_manifest(job)
+        for j, frames in video_frames.items():
+            assets[j]["video"] = self._upload_video(jobs[j], [frames[i] for i in sorted(frames)])
+        return assets
+
     @modal.method()
     def generate_frames(self, prompt_a, prompt_b, type, frames, path_prefix):
         """
         Generates individual frames.
         """
-        import torch
-        from PIL import Image
-        from rembg import remove
-        
         print(f"🖌️ Generating {frames} frames for {path_prefix}...")
+        job = {"prompt_a": prompt_a, "prompt_b": prompt_b, "type": type, "frames": frames, "path_prefix": path_prefix}
+        return self._render_jobs([job])[0]["frames"]
 
-        # Seamless Patch (Only applying for Pano to ensure 360 loop)
-        if type == "pano":
-            def patch(m):
-                if isinstance(m, torch.nn.Conv2d): m.padding_mode = 'circular'
-                return m
-            self.pipe.unet.apply(patch)
-            self.pipe.vae.apply(patch)
-        else:
-            # Reset to default if container is reused
-            def unpatch(m):
-                if isinstance(m, torch.nn.Conv2d): m.padding_mode = 'zeros'
-                return m
-            self.pipe.unet.apply(unpatch)
-            self.pipe.vae.apply(unpatch)
-
-        width, height = (1024, 512) if type == "pano" else (512, 512)
-        urls = []
-        
-        curr_image = Image.new("RGB", (width, height), (128,128,128))
-        
-        for i in range(frames):
-            p = prompt_a if i < frames/2 else (prompt_b or prompt_a)
-            
-            strength = 0.5 if i > 0 else 1.0
-            
-            out = self.pipe(
-                prompt=f"Ink and watercolor style, {p}",
-                image=curr_image,
-                strength=strength,
-                num_inference_steps=2,
-                guidance_scale=0.0
-            ).images[0]
-            
-            curr_image = out 
+    @modal.method()
+    def generate_batch(self, jobs):
+        """
+        Generates frames for many jobs at once. Frame k of every job sharing a
+        resolution and padding mode runs as a single batched pipe call.
+        Returns one asset per job, in job order:
+            {"frames": [full urls], "tiers": {"md": [...], ...}, "format": "webp"}
+        Jobs with an "atlas" path (and optional "variant", e.g. a stance name)
+        are packed into one sprite sheet per path instead of per-frame files;
+        their asset carries "atlas" metadata and an empty "frames" list.
+        Jobs with "video" set to a codec ("h264", "vp9", "av1") also get a
+        looping clip under "video"; the still frames remain the fallback.
+        Pano jobs with "tiles" ("cubemap" or "equirect") also upload per-frame
+        tiles at two resolution levels and return a manifest under "tiles".
+        """
+        print(f"🖌️ Generating batch of {len(jobs)} jobs...")
+        return self._render_jobs(jobs)
 
-            if type == "sprite":
-                out = remove(out, session=self.rembg)
-                ext = "png"
-            else:
-                ext = "jpg"
 
-            url = self._upload(out, f"{path_prefix}_{i}.{ext}")
-            urls.append(url)
-            
-        return urls
\ No newline at end of file
+    @modal.method()
+    def generate_batch_events(self, jobs):
+        """
+        Generator version of generate_batch. Yields events while rendering:
+            {"type": "preview", "job": j, "preview": "data:image/jpeg;base64,..."}
+                for jobs with "preview" set, right after their first frame
+            {"type": "frame", "job": j, "index": i, "urls": {tier: url}, "gen_s", "upload_s"}
+                as soon as each frame's uploads finish (may arrive out of order;
+                gen_s is seconds from batch start, upload_s the matting/encode/upload time)
+            {"type": "assets", "assets": [...]}  last, same shape as generate_batch
+        """
+        print(f"🖌️ Streaming batch of {len(jobs)} jobs...")
+        events = queue.Queue()
+        done = object()
+        result = {}
+
+        def work():
+            try:
+                result["assets"] = self._render_jobs(jobs, emit=events.put)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                events.put(done)
+
+        threading.Thread(target=work, daemon=True).start()
+        while (event := events.get()) is not done:
+            yield event
+        if "error" in result:
+            raise result["error"]
+        yield {"type": "assets", "assets": result["assets"]}
+
+@app.cls(gpu=GPU_CONFIG, image=image, secrets=[modal.Secret.from_name("gcp-credentials")], enable_memory_snapshot=True,scaledown_window=120,min_containers=1)
+class PanoPainter(DreamPainter):
+    JOB_TYPE = "pano"
+
+
+# Sprites always follow a background render, so the API's warmup wakes this pool
+# in time; only the pano pool pays for an always-on GPU
+@app.cls(gpu=GPU_CONFIG, image=image, secrets=[modal.Secret.from_name("gcp-credentials")], enable_memory_snapshot=True,scaledown_window=120,min_containers=0)
+class SpritePainter(DreamPainter):
+    JOB_TYPE = "sprite"
@@ -0,0 +1,163 @@
+"""
+Tiled panorama assets for view-dependent loading.
+
+Slices each equirectangular background into equirect tiles or cubemap faces
+at a couple of resolution levels, so the client can fetch what's in front of
+the gyro camera first at low resolution and refine from there. CPU only
+(PIL + NumPy). Face order and orientation follow the OpenGL/three.js
+cubemap convention: px, nx, py, ny, pz, nz.
+
+Tile paths, relative to a frame's tile root:
+    equirect: L{level}/{row}_{col}.jpg
+    cubemap:  L{level}/{face}_{row}_{col}.jpg
+"""
+import numpy as np
+from PIL import Image
+
+TILE_SIZE = 256
+EQUIRECT_LEVELS = [512, 1024]   # panorama widths (height = width / 2)
+CUBEMAP_LEVELS = [256, 512]     # face edge lengths
+FACES = ["px", "nx", "py", "ny", "pz", "nz"]
+
+
+# --- SAMPLING ---
+def _bilinear(arr, x, y, wrap_x=False):
+    """Samples HxWxC `arr` at float pixel coords (pixel centres at integers)."""
+    h, w = arr.shape[:2]
+    x0 = np.floor(x).astype(int)
+    y0 = np.floor(y).astype(int)
+    fx = (x - x0)[..., None]
+    fy = (y - y0)[..., None]
+    if wrap_x:
+        xa, xb = x0 % w, (x0 + 1) % w
+    else:
+        xa, xb = np.clip(x0, 0, w - 1), np.clip(x0 + 1, 0, w - 1)
+    ya, yb = np.clip(y0, 0, h - 1), np.clip(y0 + 1, 0, h - 1)
+    top = arr[ya, xa] * (1 - fx) + arr[ya, xb] * fx
+    bottom = arr[yb, xa] * (1 - fx) + arr[yb, xb] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def _face_dirs(face, size):
+    """Unit-cube direction for every pixel of one face."""
+    c = (np.arange(size) + 0.5) / size * 2 - 1
+    u, v = np.meshgrid(c, c)
+    one = np.ones_like(u)
+    return {
+        "px": (one, -v, -u), "nx": (-one, -v, u),
+        "py": (u, one, v), "ny": (u, -one, -v),
+        "pz": (u, -v, one), "nz": (-u, -v, -one),
+    }[face]
+
+
+def _dir_to_equirect(x, y, z, width, height):
+    lon = np.arctan2(x, z)
+    lat = np.arctan2(y, np.hypot(x, z))
+    px = (lon / (2 * np.pi) + 0.5) * width - 0.5
+    py = (0.5 - lat / np.pi) * height - 0.5
+    return px, py
+
+
+# --- LAYOUTS ---
+def cubemap_faces(image, face_size):
+    """{face: PIL image} resampled from an equirectangular PIL image."""
+    arr = np.asarray(image.convert("RGB"), dtype=np.float32)
+    h, w = arr.shape[:2]
+    faces = {}
+    for face in FACES:
+        px, py = _dir_to_equirect(*_face_dirs(face, face_size), w, h)
+        faces[face] = Image.fromarray(np.clip(_bilinear(arr, px, py, wrap_x=True), 0, 255).astype(np.uint8))
+    return faces
+
+
+def faces_to_equirect(faces, width, height):
+    """Inverse of cubemap_faces, used to verify the round trip."""
+    size = next(iter(faces.values())).width
+    arrs = {f: np.asarray(img.convert("RGB"), dtype=np.float32) for f, img in faces.items()}
+    lon = ((np.arange(width) + 0.5) / width - 0.5) * 2 * np.pi
+    lat = (0.5 - (np.arange(height) + 0.5) / height) * np.pi
+    lon, lat = np.meshgrid(lon, lat)
+    x, y, z = np.cos(lat) * np.sin(lon), np.sin(lat), np.cos(lat) * np.cos(lon)
+    ax, ay, az = np.abs(x), np.abs(y), np.abs(z)
+
+    out = np.zeros((height, width, 3), dtype=np.float32)
+    choices = [
+        ("px", (ax >= ay) & (ax >= az) & (x > 0), -z / ax, -y / ax),
+        ("nx", (ax >= ay) & (ax >= az) & (x <= 0), z / ax, -y / ax),
+        ("py", (ay > ax) & (ay >= az) & (y > 0), x / ay, z / ay),
+        ("ny", (ay > ax) & (ay >= az) & (y <= 0), x / ay, -z / ay),
+        ("pz", (az > ax) & (az > ay) & (z > 0), x / az, -y / az),
+        ("nz", (az > ax) & (az > ay) & (z <= 0), -x / az, -y / az),
+    ]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for face, mask, u, v in choices:
+            fx = (u[mask] + 1) / 2 * size - 0.5
+            fy = (v[mask] + 1) / 2 * size - 0.5
+            out[mask] = _bilinear(arrs[face], fx, fy)
+    return Image.fromarray(np.clip(out, 0, 255).astype(np.uint8))
+
+
+def _grid(image, tile_size):
+    cols = max(1, image.width // tile_size)
+    rows = max(1, image.height // tile_size)
+    tw, th = image.width // cols, image.height // rows
+    for row in range(rows):
+        for col in range(cols):
+            yield row, col, image.crop((col * tw, row * th, (col + 1) * tw, (row + 1) * th))
+
+
+def describe_levels(layout, tile_size=TILE_SIZE, levels=None):
+    """Level metadata for the manifest; independent of the frame's pixels."""
+    if layout == "equirect":
+        return [{"level": level, "width": width, "height": width // 2,
+                 "cols": max(1, width // tile_size), "rows": max(1, (width // 2) // tile_size)}
+                for level, width in enumerate(levels or EQUIRECT_LEVELS)]
+    if layout == "cubemap":
+        return [{"level": level, "face_size": size,
+                 "cols": max(1, size // tile_size), "rows": max(1, size // tile_size)}
+                for level, size in enumerate(levels or CUBEMAP_LEVELS)]
+    raise ValueError(f"Unknown tile layout '{layout}'")
+
+
+def tile_set(image, layout="cubemap", tile_size=TILE_SIZE, levels=None):
+    """
+    Returns (tiles, levels_meta): tiles is [(relative path, PIL tile)],
+    levels_meta describes each level for the manifest.
+    """
+    meta = describe_levels(layout, tile_size, levels)
+    tiles = []
+    for lm in meta:
+        if layout == "equirect":
+            scaled = image.convert("RGB").resize((lm["width"], lm["height"]), Image.Resampling.LANCZOS)
+            tiles += [(f"L{lm['level']}/{row}_{col}", tile) for row, col, tile in _grid(scaled, tile_size)]
+        else:
+            faces = cubemap_faces(image, lm["face_size"])
+            for face in FACES:
+                tiles += [(f"L{lm['level']}/{face}_{row}_{col}", tile) for row, col, tile in _grid(faces[face], tile_size)]
+    return tiles, meta
+
+
+def recompose(tiles, levels_meta, layout, level, width, height):
+    """Stitches one level's tiles back into an equirect image of width x height."""
+    lm = levels_meta[level]
+    by_path = dict(tiles)
+    prefix = f"L{level}/"
+
+    def stitch(name_fmt, w, h):
+        canvas = Image.new("RGB", (w, h))
+        tw, th = w // lm["cols"], h // lm["rows"]
+        for row in range(lm["rows"]):
+            for col in range(lm["cols"]):
+                canvas.paste(by_path[prefix + name_fmt.format(row=row, col=col)], (col * tw, row * th))
+        return canvas
+
+    if layout == "equirect":
+        return stitch("{row}_{col}", lm["width"], lm["height"]).resize((width, height), Image.Resampling.LANCZOS)
+    faces = {f: stitch(f + "_{row}_{col}", lm["face_size"], lm["face_size"]) for f in FACES}
+    return faces_to_equirect(faces, width, height)
+
+
+def tile_manifest(layout, levels_meta, url_template, tile_size=TILE_SIZE):
+    """url_template contains {frame} and {tile} (a relative tile path without extension)."""
+    return {"layout": layout, "tile_size": tile_size, "faces": FACES if layout == "cubemap" else None,
+            "levels": levels_meta, "url_template": url_template}
@@ -0,0 +1,105 @@
+"""
+Load-adaptive generation quality for the waterfall.
+
+Each waterfall asks the controller for a tier when it starts. The tier is
+chosen from the pressure on the GPU pools: how many waterfalls are in flight
+(plus queued off-path renders) and the recent seconds-per-frame of Modal
+calls. Lower tiers render fewer frames, smaller frames and fewer stations.
+Pressure going up drops the tier at once; the tier only climbs back after
+pressure has stayed lower for RESTORE_AFTER_S, so a burst that is draining
+doesn't flap between tiers.
+
+The tier name is stored on the dream (`quality_tier`). Stations a tier's cap
+left out stay PENDING and the dream ends DEGRADED rather than COMPLETE, so
+the bulk resume (/admin/dreams/resume) renders them once pressure drops.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+# Ordered best first. Sizes stay multiples of 64 for the SDXL UNet.
+TIERS = {
+    "full": {"bg_frames": 3, "sprite_frames": 4, "stations": 7, "pano_size": (1024, 512), "sprite_size": (512, 512)},
+    "reduced": {"bg_frames": 3, "sprite_frames": 3, "stations": 5, "pano_size": (1024, 512), "sprite_size": (384, 384)},
+    "minimal": {"bg_frames": 2, "sprite_frames": 2, "stations": 3, "pano_size": (768, 384), "sprite_size": (384, 384)},
+    # TEST_MODE pins this one
+    "test": {"bg_frames": 2, "sprite_frames": 2, "stations": 1, "pano_size": (1024, 512), "sprite_size": (512, 512)},
+}
+ADAPTIVE_TIERS = ["full", "reduced", "minimal"]
+# Waterfalls in flight (plus queued renders) at which each tier starts
+DEPTH_THRESHOLDS = [0, int(os.environ.get("QUALITY_REDUCED_AT", "4")), int(os.environ.get("QUALITY_MINIMAL_AT", "8"))]
+# Median seconds per rendered frame at which each tier starts
+LATENCY_THRESHOLDS = [0.0, float(os.environ.get("QUALITY_REDUCED_FRAME_S", "2.5")), float(os.environ.get("QUALITY_MINIMAL_FRAME_S", "5"))]
+RESTORE_AFTER_S = 60
+LATENCY_WINDOW = 30
+LATENCY_MAX_AGE_S = 300  # an idle pool's old samples say nothing about now
+
+
+def level_for(value, thresholds):
+    return max(i for i, t in enumerate(thresholds) if value >= t)
+
+
+class QualityController:
+    def __init__(self, pinned=None, restore_after=RESTORE_AFTER_S, clock=time.monotonic):
+        self.pinned = pinned
+        self.restore_after = restore_after
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.active = 0
+        self.level = 0
+        self.calm_since = None
+        self.samples = deque(maxlen=LATENCY_WINDOW)  # (time, seconds per frame)
+        self.stats = {name: 0 for name in ADAPTIVE_TIERS}
+
+    def frame_latency(self):
+        """Median seconds per frame over recent Modal calls, or None."""
+        now = self.clock()
+        recent = sorted(s for t, s in self.samples if now - t < LATENCY_MAX_AGE_S)
+        return recent[len(recent) // 2] if recent else None
+
+    def pressure(self, backlog=0):
+        depth_level = level_for(self.active + backlog, DEPTH_THRESHOLDS)
+        latency = self.frame_latency()
+        latency_level = level_for(latency, LATENCY_THRESHOLDS) if latency is not None else 0
+        return max(depth_level, latency_level)
+
+    def acquire(self, backlog=0):
+        """Tier name for a waterfall starting now; pair with release()."""
+        with self.lock:
+            self.active += 1
+            if self.pinned:
+                return self.pinned
+            wanted = self.pressure(backlog)
+            now = self.clock()
+            if wanted >= self.level:
+                self.level = wanted
+                self.calm_since = None
+            elif self.calm_since is None:
+                self.calm_since = now
+            elif now - self.calm_since >= self.restore_after:
+                # One step at a time, each after its own calm period
+                self.level -= 1
+                self.calm_since = now if wanted < self.level else None
+            name = ADAPTIVE_TIERS[self.level]
+            self.stats[name] += 1
+            return name
+
+    def release(self):
+        with self.lock:
+            self.active = max(0, self.active - 1)
+
+    def observe(self, seconds, frames):
+        """Wall time of one Modal render call and the frames it produced."""
+        if frames:
+            with self.lock:
+                self.samples.append((self.clock(), seconds / frames))
+
+    def snapshot(self):
+        latency = self.frame_latency()
+        return {
+            "tier": self.pinned or ADAPTIVE_TIERS[self.level],
+            "active": self.active,
+            "frame_s_p50": round(latency, 2) if latency is not None else None,
+            "waterfalls_by_tier": dict(self.stats),
+        }
@@ -0,0 +1,178 @@
+"""
+Provisional dream analysis without the LLM.
+
+Keyword and noun-phrase heuristics over the raw report produce, in a
+millisecond or two, everything the background render needs to
+start: a slug, title, description_360 and a station skeleton. The result has
+the DreamGenerationResponse shape; the LLM analysis refines it later.
+
+Phrases are runs of up to three content words between stopwords and
+punctuation, ranked by frequency, by how early they appear and by length.
+Adverbs (-ly) always break a run; -ed/-ing words only survive as modifiers
+in front of another content word ("glowing serpent"), not as its head.
+Capitalised words that don't start a sentence are treated as names and get
+stations first.
+
+Run `python quick_analyzer.py "<dream report>"` to see the output.
+"""
+import hashlib
+import re
+from collections import Counter
+
+MAX_STATIONS = 7  # central image + 6 entities, as in dream_analyzer.SYSTEM_PROMPT
+MAX_PHRASE_WORDS = 3
+SCENE_PHRASES = 4
+
+STOPWORDS = set("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+could did do does doing down during each few for from further had has have having he her here hers herself him himself
+his how i if in into is it its itself just like me more most my myself no nor not now of off on once only or other our
+ours ourselves out over own same she should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where which while who whom why will with would
+you your yours yourself yourselves dream dreamed dreamt dreaming remember felt feel seemed seem suddenly something
+someone thing things there's i'm i was could then also began become became saw see seen looked look went go going
+came come got get one two into onto upon toward towards around inside outside almost still even ever never
+among beside before behind beneath beyond across along within without sat stood lay half
+""".split())
+WORD = re.compile(r"[A-Za-zÀ-ÿ'-]+")
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def sentences(text):
+    return [s.strip() for s in SENTENCE.split(text.strip()) if s.strip()]
+
+
+def is_verbish(word):
+    return word.endswith(("ed", "ing")) and len(word) > 4
+
+
+def stem(word):
+    """Crude plural folding so "chain" and "chains" count together."""
+    return word[:-1] if word.endswith("s") and not word.endswith("ss") and len(word) > 3 else word
+
+
+def candidate_phrases(text):
+    """[(phrase, sentence index)] for every run of content words."""
+    out = []
+
+    def flush(run, s_idx):
+        while run and is_verbish(run[-1]):
+            run.pop()
+        for i in range(0, len(run), MAX_PHRASE_WORDS):
+            out.append((" ".join(run[i:i + MAX_PHRASE_WORDS]), s_idx))
+
+    for s_idx, sentence in enumerate(sentences(text)):
+        for chunk in re.split(r"[,;:()\"“”.!?—–]+", sentence):
+            run = []
+            for word in WORD.findall(chunk) + [""]:
+                w = word.lower().strip("'-")
+                if w and w not in STOPWORDS and len(w) > 2 and not w.endswith("ly"):
+                    run.append(w)
+                    continue
+                flush(run, s_idx)
+                run = []
+    return out
+
+
+def rank_phrases(text):
+    """Content phrases, best first; phrases contained in a better one are dropped."""
+    found = candidate_phrases(text)
+    counts = Counter(p for p, _ in found)
+    words = Counter(stem(w) for p, _ in found for w in p.split())
+    first_seen = {}
+    for p, s_idx in found:
+        first_seen.setdefault(p, s_idx)
+
+    def score(p):
+        # Repeated words matter more than repeated exact phrases
+        return counts[p] + sum(words[stem(w)] for w in p.split()) / len(p.split()) + 0.5 * len(p.split()) - 0.3 * first_seen[p]
+
+    ranked = []
+    for p in sorted(counts, key=score, reverse=True):
+        if not any(p in q or q in p for q in ranked):
+            ranked.append(p)
+    return ranked
+
+
+def proper_names(text):
+    """Capitalised multi-word runs that don't start a sentence (John Dee, August Kekulé)."""
+    names = []
+    for sentence in sentences(text):
+        tokens = WORD.findall(sentence)
+        run = []
+        for i, tok in enumerate(tokens + [""]):
+            if i > 0 and tok[:1].isupper() and tok.lower() not in STOPWORDS:
+                run.append(tok)
+                continue
+            if run and " ".join(run) not in names:
+                names.append(" ".join(run))
+            run = []
+    return names
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:48]
+
+
+def station_skeleton(index, name, proper=False):
+    # Proper names keep their casing and take no article ("John Dee", not "the john dee")
+    subject = name if proper else f"the {name.lower()}"
+    return {
+        "id": str(index),
+        "position_index": index,
+        "entity_name": name,
+        "state_start": f"{name}, still and watchful",
+        "state_end": f"{name}, stirring",
+        "entity_greeting": f"{subject[:1].upper()}{subject[1:]} waits.",
+        "interaction_options": [
+            f"Approach {subject}",
+            f"Ask {subject} what it means",
+            f"Watch {subject} in silence",
+            f"Reach out to {subject}",
+        ],
+        "asset_status": "PENDING",
+    }
+
+
+def provisional_analysis(text, salt=""):
+    """DreamGenerationResponse-shaped dict. `salt` (e.g. the user id) keeps slugs unique per submitter."""
+    phrases = rank_phrases(text) or ["dream"]
+    names = proper_names(text)
+    central = phrases[0]
+    title = central.title()
+    slug = f"{slugify(title) or 'dream'}-{hashlib.sha1((salt + text).encode()).hexdigest()[:6]}"
+
+    entities = [central.title()]
+    for candidate in names + [p.title() for p in phrases[1:]]:
+        if len(entities) == MAX_STATIONS:
+            break
+        if candidate.lower() not in (e.lower() for e in entities):
+            entities.append(candidate)
+
+    # Names make poor scenery; they only become stations
+    lowered = {n.lower() for n in names}
+    scene = [p for p in phrases if p not in lowered] or phrases
+    sents = sentences(text) or [text.strip()]
+    return {
+        "hex": {
+            "title": title,
+            "slug": slug,
+            "description_360": "a dreamlike panorama of " + ", ".join(scene[:SCENE_PHRASES]),
+            "central_imagery": central,
+            "stations": [station_skeleton(i, name, proper=name in names) for i, name in enumerate(entities)],
+        },
+        "summary_short": sents[0][:200],
+        "summary_long": " ".join(sents[:4]),
+        "entities": entities,
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    import time
+
+    started = time.perf_counter()
+    result = provisional_analysis(sys.argv[1])
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"⏱️ {1000 * (time.perf_counter() - started):.2f} ms")
@@ -0,0 +1,66 @@
+"""
+Sprite sheet packing for station animations.
+
+Production version of the `create_sprite_sheet` prototype in
+docs/api_prototype.py. Frames are trimmed to their alpha bounds and laid out
+on a grid whose cell fits the largest trimmed frame, so one atlas can hold a
+station's frames for every stance variant. The metadata lets the client cut
+each frame back out and place it at its original offset:
+
+    {"cols", "rows", "cell": [w, h], "size": [W, H], "source_size": [w, h],
+     "frames": {variant: [{"x", "y", "w", "h", "ox", "oy"}, ...]}}
+"""
+import math
+
+from PIL import Image
+
+ATLAS_PADDING = 2
+
+
+def trim_bounds(image):
+    """Alpha bounding box (left, top, right, bottom); the full frame if empty or opaque."""
+    alpha = image.getchannel("A") if "A" in image.getbands() else None
+    box = alpha.getbbox() if alpha else None
+    return box or (0, 0, image.width, image.height)
+
+
+def pack_atlas(frames_by_variant, cols=None, padding=ATLAS_PADDING):
+    """
+    frames_by_variant: {variant: [PIL images]}, in the order frames should play.
+    Returns (atlas RGBA image, metadata dict).
+    """
+    entries = []
+    for variant, frames in frames_by_variant.items():
+        for img in frames:
+            img = img.convert("RGBA")
+            entries.append((variant, img, trim_bounds(img)))
+    if not entries:
+        return None, None
+
+    cell_w = max(b[2] - b[0] for _, _, b in entries) + padding
+    cell_h = max(b[3] - b[1] for _, _, b in entries) + padding
+    count = len(entries)
+    if cols is None:
+        cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+
+    atlas = Image.new("RGBA", (cols * cell_w, rows * cell_h), (0, 0, 0, 0))
+    meta = {
+        "cols": cols,
+        "rows": rows,
+        "cell": [cell_w, cell_h],
+        "size": [atlas.width, atlas.height],
+        "source_size": list(entries[0][1].size),
+        "frames": {variant: [] for variant in frames_by_variant},
+    }
+
+    for index, (variant, img, box) in enumerate(entries):
+        x = (index % cols) * cell_w
+        y = (index // cols) * cell_h
+        atlas.paste(img.crop(box), (x, y))
+        meta["frames"][variant].append({
+            "x": x, "y": y, "w": box[2] - box[0], "h": box[3] - box[1],
+            "ox": box[0], "oy": box[1],
+        })
+
+    return atlas, meta
@@ -0,0 +1,70 @@
+"""
+Background removal for sprite sequences.
+
+Consecutive sprite frames come from img2img at strength 0.5 and barely move,
+so running the full rembg model on every frame is mostly wasted work.
+MaskPropagator runs the model on the first frame, then carries the mask
+forward: pixels that changed since the last matted frame get the previous
+mask dilated over them (so a limb that moved a few pixels isn't clipped),
+everything else keeps the previous alpha. When too much of the frame changes,
+it falls back to a full matting pass.
+"""
+from PIL import Image, ImageChops, ImageFilter
+
+THUMB_SIZE = (64, 64)
+PIXEL_CHANGE = 24            # 0-255 grey delta for a pixel to count as changed
+SIMILARITY_THRESHOLD = 0.15  # max changed fraction before full matting
+REFINE_RADIUS = 5            # dilation (px, odd) applied over changed regions
+
+
+def full_mask(image, session):
+    from rembg import remove
+    return remove(image, session=session, only_mask=True).convert("L")
+
+
+def changed_fraction(a, b):
+    """Share of thumbnail pixels whose grey value moved more than PIXEL_CHANGE."""
+    ta = a.convert("L").resize(THUMB_SIZE)
+    tb = b.convert("L").resize(THUMB_SIZE)
+    diff = ImageChops.difference(ta, tb).point(lambda v: 255 if v > PIXEL_CHANGE else 0)
+    return diff.histogram()[255] / (THUMB_SIZE[0] * THUMB_SIZE[1])
+
+
+def refine_mask(prev_mask, prev_image, image):
+    """Previous mask, dilated only where the frame actually changed."""
+    change = ImageChops.difference(prev_image.convert("L"), image.convert("L"))
+    change = change.point(lambda v: 255 if v > PIXEL_CHANGE else 0)
+    change = change.filter(ImageFilter.MaxFilter(REFINE_RADIUS))
+    grown = prev_mask.filter(ImageFilter.MaxFilter(REFINE_RADIUS))
+    return Image.composite(grown, prev_mask, change).filter(ImageFilter.GaussianBlur(1))
+
+
+class MaskPropagator:
+    """
+    Stateful matting for one sprite sequence; call it on frames in order.
+    `mask_fn(image)` computes a full mask and defaults to rembg with `session`.
+    """
+
+    def __init__(self, session=None, threshold=SIMILARITY_THRESHOLD, mask_fn=None):
+        self.threshold = threshold
+        self.mask_fn = mask_fn or (lambda img: full_mask(img, session))
+        self.prev_image = None
+        self.prev_mask = None
+        self.full_passes = 0
+        self.propagated = 0
+
+    def mask(self, image):
+        image = image.convert("RGB")
+        if self.prev_mask is None or changed_fraction(self.prev_image, image) > self.threshold:
+            mask = self.mask_fn(image)
+            self.full_passes += 1
+        else:
+            mask = refine_mask(self.prev_mask, self.prev_image, image)
+            self.propagated += 1
+        self.prev_image, self.prev_mask = image, mask
+        return mask
+
+    def __call__(self, image):
+        cutout = image.convert("RGBA")
+        cutout.putalpha(self.mask(image))
+        return cutout
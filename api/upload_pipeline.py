@@ -0,0 +1,105 @@
+"""
+Encode/upload pipeline for DreamPainter.
+
+The GPU thread only produces frames and hands them to `UploadPipeline.submit`.
+A thread pool runs the CPU-side work (matting, encoding every size tier) and
+the GCS uploads, retrying failed uploads without holding up the next
+diffusion step. Works with any bucket object exposing `.name` and
+`.blob(path).upload_from_file(...)`, so a fake bucket is enough to exercise
+it on CPU.
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3
+RETRY_BACKOFF = 0.5
+ERROR_URL = "error_url_upload_exception"
+
+
+def public_url(bucket, path):
+    return f"https://storage.googleapis.com/{bucket.name}/{path}"
+
+
+def upload_bytes(bucket, data, path, content_type, retries=UPLOAD_RETRIES, backoff=RETRY_BACKOFF, sleep=time.sleep):
+    """Uploads with linear backoff. Returns the public URL or ERROR_URL."""
+    for attempt in range(1, retries + 1):
+        try:
+            bucket.blob(path).upload_from_file(io.BytesIO(data), content_type=content_type)
+            return public_url(bucket, path)
+        except Exception as e:
+            print(f"⚠️ Upload attempt {attempt}/{retries} failed for {path}: {e}")
+            if attempt < retries:
+                sleep(backoff * attempt)
+    print(f"❌ UPLOAD ERROR: giving up on {path}")
+    return ERROR_URL
+
+
+class UploadPipeline:
+    """
+    Producer/consumer stage between the GPU loop and GCS.
+
+    submit(key, index, image, render, prepare=None) returns immediately.
+    `prepare` (e.g. background removal) runs on the pool first, in submission
+    order per key so stateful steps like mask propagation see frames in
+    sequence. `render(image)` then returns [(tier, path, bytes, content_type)]
+    and every rendition is uploaded; these steps are unordered. `urls(key, tier)`
+    blocks until every frame submitted under `key` is done and returns that
+    tier's URLs in frame order.
+    """
+
+    def __init__(self, bucket, workers=UPLOAD_WORKERS, retries=UPLOAD_RETRIES, backoff=RETRY_BACKOFF, sleep=time.sleep):
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self.futures = {}
+        self.prepared = {}
+
+    def _process(self, image, render, prepare, after, done):
+        try:
+            if prepare is not None:
+                # Tasks start FIFO, so `after` is already running or finished
+                if after is not None:
+                    after.wait()
+                image = prepare(image)
+        finally:
+            done.set()
+        return {
+            tier: upload_bytes(self.bucket, data, path, content_type, self.retries, self.backoff, self.sleep)
+            for tier, path, data, content_type in render(image)
+        }
+
+    def submit(self, key, index, image, render, prepare=None):
+        after = self.prepared.get(key)
+        done = self.prepared[key] = threading.Event()
+        future = self.pool.submit(self._process, image, render, prepare, after, done)
+        self.futures.setdefault(key, {})[index] = future
+        return future
+
+    def results(self, key):
+        """Per-frame {tier: url} dicts, in frame order."""
+        frames = self.futures.get(key, {})
+        results = []
+        for index in sorted(frames):
+            try:
+                results.append(frames[index].result())
+            except Exception as e:
+                print(f"❌ Frame {index} of {key} failed before upload: {e}")
+                results.append({})
+        return results
+
+    def urls(self, key, tier="full"):
+        return [r.get(tier, ERROR_URL) for r in self.results(key)]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,85 @@
+"""
+Sharded world manifest.
+
+The monolithic world.json ({"version", "dreams": [...]}) is split into a
+small index plus one shard per dream. Shard names carry a content hash, so
+they never change once published and can be cached forever; only the index
+is re-fetched. Layout (under SHARD_PREFIX in the bucket):
+
+    world/index.json               {"version", "hash", "dreams": [{"slug", "title", "thumbnail", "shard", "bytes"}]}
+    world/dreams/{slug}.{hash}.json   one dream entry, same shape as in world.json
+
+Run `python world_shards.py world.json out_dir` to shard an existing
+world.json for upload.
+"""
+import hashlib
+import json
+import re
+
+SHARD_PREFIX = "world/"
+INDEX_NAME = "index.json"
+HASH_LENGTH = 12
+SHARD_NAME = re.compile(r"^[a-z0-9-]+\.[0-9a-f]{%d}\.json$" % HASH_LENGTH)
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+
+
+def dump(data):
+    """Compact, key-sorted JSON so identical content always hashes the same."""
+    return json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode()
+
+
+def thumbnail_for(dream):
+    assets = dream.get("world_state", {}).get("generated_assets", {})
+    for level in sorted(assets):
+        paths = assets[level].get("file_paths") or []
+        if paths:
+            return paths[0]
+    return None
+
+
+def shard_world(world):
+    """Returns (index dict, index bytes, {shard name: bytes})."""
+    shards = {}
+    entries = []
+    for dream in world.get("dreams", []):
+        body = dump(dream)
+        name = f"{dream['slug']}.{content_hash(body)}.json"
+        shards[name] = body
+        entries.append({
+            "slug": dream["slug"],
+            "title": dream.get("title"),
+            "thumbnail": thumbnail_for(dream),
+            "shard": name,
+            "bytes": len(body),
+        })
+    index = {"version": world.get("version"), "dreams": entries}
+    index["hash"] = content_hash(dump(index))
+    return index, dump(index), shards
+
+
+def shard_path(name):
+    return f"{SHARD_PREFIX}dreams/{name}"
+
+
+def index_path():
+    return SHARD_PREFIX + INDEX_NAME
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    with open(sys.argv[1]) as f:
+        index, index_body, shards = shard_world(json.load(f))
+    out = sys.argv[2]
+    os.makedirs(os.path.join(out, SHARD_PREFIX, "dreams"), exist_ok=True)
+    for name, body in shards.items():
+        with open(os.path.join(out, shard_path(name)), "wb") as f:
+            f.write(body)
+    with open(os.path.join(out, index_path()), "wb") as f:
+        f.write(index_body)
+    largest = max((e["bytes"] for e in index["dreams"]), default=0)
+    print(f"🗂️ {len(shards)} shards | index {len(index_body) / 1024:.1f} KB | largest shard {largest / 1024:.1f} KB")
@@ -8,9 +8,10 @@ import { BookReader } from './components/BookReader';
 import { EntityDialog } from './components/EntityDialog';
 import { MusicPlayer } from './components/MusicPlayer'; 
 import { BOOK_CONTENT, BookPage } from './BookManifest';
-import { interactEntity } from './api'; 
+import { interactEntity, getWorldDream } from './api'; 
 
-const DREAM_DATABASE: any = require('./assets/world.json');
+// Offline fallback only; dreams normally come from the sharded world API
+const BUNDLED_WORLD: any = require('./assets/world.json');
 const SESSION_KEY = 'dreamhex_session_v3';
 const USER_ID_KEY = 'dreamhex_user_id'; 
 
@@ -132,15 +133,21 @@ export default function App() {
       }
   }, [dreamData, interactionHistory, currentDreamSlug, unlockedPageIds, dreamProgress]);
 
-  const loadFromJSON = (slug: string) => {
+  const loadFromJSON = async (slug: string) => {
       if (slug === VOID_SLUG) {
           setDreamData(VOID_DREAM_DATA);
           return;
       }
 
-      const dreams = DREAM_DATABASE.dreams || [];
-      const found = dreams.find((d: any) => d.slug === slug);
-      setDreamData(found ? JSON.parse(JSON.stringify(found)) : dreams[0]);
+      // Only the entered dream's shard is fetched; unknown slugs get the first dream.
+      // Offline (or the API failing), the bundled world keeps the player moving.
+      setDreamData(null);
+      let found = await getWorldDream(slug);
+      if (!found) {
+          const dreams = BUNDLED_WORLD.dreams || [];
+          found = dreams.find((d: any) => d.slug === slug) || dreams[0];
+      }
+      setDreamData(found ? JSON.parse(JSON.stringify(found)) : VOID_DREAM_DATA);
   };
   
   const checkPageUnlock = (currentSlug: string) => {
@@ -13,6 +13,41 @@ export const triggerWarmup = async (userId: string) => {
   }
 };
 
+// World shards are content-addressed, so a fetched shard never goes stale
+const worldShardCache: Record<string, any> = {};
+let worldIndex: any = null;
+
+export const getWorldIndex = async () => {
+  if (worldIndex) return worldIndex;
+  try {
+    const res = await fetch(`${API_URL}/world/index`);
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    worldIndex = await res.json();
+    return worldIndex;
+  } catch (error) {
+    console.error("Error fetching world index:", error);
+    return null;
+  }
+};
+
+export const getWorldDream = async (slug: string) => {
+  const index = await getWorldIndex();
+  if (!index || !index.dreams.length) return null;
+  // Unknown slugs return null too, so the caller's bundled-world fallback runs
+  const entry = index.dreams.find((d: any) => d.slug === slug);
+  if (!entry) return null;
+  if (worldShardCache[entry.shard]) return worldShardCache[entry.shard];
+  try {
+    const res = await fetch(`${API_URL}/world/shards/${entry.shard}`);
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    worldShardCache[entry.shard] = await res.json();
+    return worldShardCache[entry.shard];
+  } catch (error) {
+    console.error("Error fetching world shard:", error);
+    return null;
+  }
+};
+
 export const getDream = async (dreamId: string) => {
   try {
     const res = await fetch(`${API_URL}/dreams/${dreamId}`);
@@ -110,6 +145,22 @@ export const reprocessDream = async (dreamId: string, userId: string) => {
   }
 };
 
+// Regenerates only the assets a failed or interrupted generation left missing
+export const resumeDream = async (dreamId: string, userId: string) => {
+  try {
+    const res = await fetch(`${API_URL}/dreams/resume/${dreamId}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ user_id: userId })
+    });
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    return res.json();
+  } catch (error) {
+    console.error("Error resuming dream:", error);
+    throw error;
+  }
+};
+
 export const getRandomMusic = async () => {
   try {
     const res = await fetch(`${API_URL}/music/random`);
@@ -43,6 +43,8 @@ export const DreamScene: React.FC<DreamSceneProps> = ({
   let bgFrames = dreamData?.world_state?.generated_assets?.[levelKey]?.file_paths || [];
   if (bgFrames.length === 0) bgFrames = dreamData?.world_state?.generated_asset?.file_paths || [];
   if (bgFrames.length === 0) bgFrames = dreamData?.hex?.background_frames || [];
+  // Blurred frame-0 preview while the full background is still rendering
+  if (bgFrames.length === 0 && dreamData?.hex?.background_preview) bgFrames = [dreamData.hex.background_preview];
   
   const stations = dreamData?.stations || dreamData?.hex?.stations || [];
   // Ensure we have at least 2 steps (1 for BG, 2 for Book) even if no stations
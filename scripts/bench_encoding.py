@@ -0,0 +1,84 @@
+"""
+CPU benchmark for frame encodings: bytes, encode time and SSIM per format,
+quality and size tier.
+
+Usage: python scripts/bench_encoding.py <frames_dir>
+    Files with "bg" in the name are treated as panoramas, the rest as sprites.
+    SSIM is measured on luma against the source frame (alpha composited on
+    white for sprites) after upscaling smaller tiers back to full size.
+"""
+import io
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from image_encoding import FORMATS, TIERS_BY_TYPE, encode_image, resize_for_tier, resolve_format
+
+CANDIDATES = {
+    "pano": [("jpg", None), ("jpg", 70), ("webp", 80), ("webp", 65), ("avif", 60)],
+    "sprite": [("png", None), ("webp", 80), ("webp", 65), ("avif", 60)],
+}
+
+
+def _box(a, k=7):
+    """Mean over k x k windows (valid region) using summed-area tables."""
+    s = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return (s[k:, k:] - s[:-k, k:] - s[k:, :-k] + s[:-k, :-k]) / (k * k)
+
+
+def ssim(a, b):
+    a = np.asarray(a.convert("L"), dtype=np.float64)
+    b = np.asarray(b.convert("L"), dtype=np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ma, mb = _box(a), _box(b)
+    va, vb = _box(a * a) - ma ** 2, _box(b * b) - mb ** 2
+    cov = _box(a * b) - ma * mb
+    s = ((2 * ma * mb + c1) * (2 * cov + c2)) / ((ma ** 2 + mb ** 2 + c1) * (va + vb + c2))
+    return float(s.mean())
+
+
+def flatten(img):
+    if img.mode != "RGBA":
+        return img.convert("RGB")
+    bg = Image.new("RGB", img.size, (255, 255, 255))
+    bg.paste(img, mask=img.split()[-1])
+    return bg
+
+
+def run(frames_dir):
+    frames = defaultdict(list)
+    for name in sorted(os.listdir(frames_dir)):
+        if not name.lower().endswith((".png", ".jpg", ".jpeg", ".webp")): continue
+        kind = "pano" if "bg" in name else "sprite"
+        frames[kind].append(Image.open(os.path.join(frames_dir, name)))
+
+    for kind, images in frames.items():
+        print(f"\n📊 {kind}: {len(images)} frames")
+        for ext, quality in CANDIDATES[kind]:
+            if resolve_format(ext) != ext: continue
+            for tier in TIERS_BY_TYPE[kind]:
+                nbytes, elapsed, scores = 0, 0.0, []
+                for img in images:
+                    src = img.convert("RGBA" if kind == "sprite" else "RGB")
+                    scaled = resize_for_tier(src, tier)
+                    t0 = time.perf_counter()
+                    data, _ = encode_image(scaled, f"frame.{ext}", quality)
+                    elapsed += time.perf_counter() - t0
+                    nbytes += len(data)
+                    decoded = Image.open(io.BytesIO(data)).resize(src.size, Image.Resampling.LANCZOS)
+                    scores.append(ssim(flatten(src), flatten(decoded)))
+                q = quality if quality is not None else FORMATS[ext][2].get("quality", "-")
+                print(f"{ext:5s} q={str(q):4s} {tier:4s} | {nbytes / len(images) / 1024:8.1f} KB/frame | "
+                      f"{1000 * elapsed / len(images):7.1f} ms | SSIM {np.mean(scores):.4f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1])
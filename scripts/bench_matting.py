@@ -0,0 +1,81 @@
+"""
+CPU benchmark for sprite matting: full rembg per frame vs mask propagation,
+for each model tier, on ONNX Runtime's CPUExecutionProvider.
+
+Usage: python scripts/bench_matting.py <frames_dir>
+    frames_dir holds one sub-folder (or filename prefix) per sprite sequence,
+    e.g. the *_idle_0.png .. *_idle_3.png output of world_builder.
+
+Quality is reported against full u2net masks: mean absolute alpha error and
+IoU of the thresholded masks.
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image
+from rembg import new_session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from sprite_matting import MaskPropagator, full_mask
+
+TIERS = ["u2net", "u2netp"]
+
+
+def load_sequences(frames_dir):
+    seqs = defaultdict(list)
+    for root, _, names in os.walk(frames_dir):
+        for name in sorted(names):
+            if not name.lower().endswith((".png", ".jpg", ".jpeg")): continue
+            prefix = name.rsplit("_", 1)[0]
+            seqs[os.path.join(root, prefix)].append(Image.open(os.path.join(root, name)).convert("RGB"))
+    return [frames for frames in seqs.values() if len(frames) > 1]
+
+
+def compare(mask, ref):
+    a = np.asarray(mask, dtype=np.float32) / 255.0
+    b = np.asarray(ref, dtype=np.float32) / 255.0
+    inter = np.logical_and(a > 0.5, b > 0.5).sum()
+    union = np.logical_or(a > 0.5, b > 0.5).sum()
+    return float(np.abs(a - b).mean()), float(inter / union) if union else 1.0
+
+
+def run(frames_dir):
+    seqs = load_sequences(frames_dir)
+    n_frames = sum(len(s) for s in seqs)
+    print(f"📊 {len(seqs)} sequences, {n_frames} frames")
+
+    sessions = {t: new_session(t, providers=["CPUExecutionProvider"]) for t in TIERS}
+    reference = [[full_mask(f, sessions["u2net"]) for f in seq] for seq in seqs]
+
+    for tier in TIERS:
+        for mode in ("full", "propagate"):
+            errs, ious, full_passes = [], [], 0
+            t0 = time.perf_counter()
+            masks = []
+            for seq in seqs:
+                if mode == "full":
+                    masks.append([full_mask(f, sessions[tier]) for f in seq])
+                    full_passes += len(seq)
+                else:
+                    prop = MaskPropagator(sessions[tier])
+                    masks.append([prop.mask(f) for f in seq])
+                    full_passes += prop.full_passes
+            elapsed = time.perf_counter() - t0
+
+            for seq_masks, seq_ref in zip(masks, reference):
+                for m, r in zip(seq_masks, seq_ref):
+                    err, iou = compare(m, r)
+                    errs.append(err); ious.append(iou)
+
+            print(f"{tier:7s} {mode:9s} | {1000 * elapsed / n_frames:7.1f} ms/frame | "
+                  f"full passes {full_passes:3d}/{n_frames} | alpha MAE {np.mean(errs):.4f} | IoU {np.mean(ious):.3f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1])
@@ -0,0 +1,60 @@
+"""
+CPU benchmark: bytes per hex for background JPEG frames vs looping clips.
+
+Usage: python scripts/bench_video.py <assets_dir>
+    Walks a world_builder export (assets/<slug>/<slug>_bg_lvl1_0.jpeg ...) and
+    groups background frames by their prefix, one group per hex/level.
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from loop_video import CODECS, encode_loop
+
+
+def load_groups(assets_dir):
+    groups = defaultdict(list)
+    for root, _, names in os.walk(assets_dir):
+        for name in sorted(names):
+            if "_bg" not in name or not name.lower().endswith((".jpg", ".jpeg")): continue
+            groups[os.path.join(root, name.rsplit("_", 1)[0])].append(os.path.join(root, name))
+    return groups
+
+
+def run(assets_dir):
+    groups = load_groups(assets_dir)
+    print(f"📊 {len(groups)} background sequences")
+    totals = defaultdict(int)
+    timings = defaultdict(float)
+
+    for prefix, paths in groups.items():
+        totals["jpeg"] += sum(os.path.getsize(p) for p in paths)
+        frames = [Image.open(p).convert("RGB") for p in paths]
+        for codec in CODECS:
+            try:
+                t0 = time.perf_counter()
+                data, _, _ = encode_loop(frames, codec)
+                timings[codec] += time.perf_counter() - t0
+                totals[codec] += len(data)
+            except Exception as e:
+                print(f"⚠️ {codec} unavailable: {e}")
+
+    n = max(len(groups), 1)
+    base = totals["jpeg"] / n
+    print(f"{'jpeg':5s} | {base / 1024:8.1f} KB/hex")
+    for codec in CODECS:
+        if codec not in totals: continue
+        per_hex = totals[codec] / n
+        print(f"{codec:5s} | {per_hex / 1024:8.1f} KB/hex | saved {(base - per_hex) / 1024:8.1f} KB "
+              f"({100 * (1 - per_hex / base):5.1f}%) | {timings[codec] / n:6.2f} s/hex encode")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1])
@@ -0,0 +1,214 @@
+"""
+Bulk loader: world_builder manifests -> Firestore `dreams` documents.
+
+Maps each dream in a world.json from scripts/world_builder.py onto the
+DreamHex/Station shape the API serves (validated with the models in
+api/dream_analyzer.py) and writes them with Firestore's BulkWriter, which
+batches and commits in parallel. Documents are keyed by slug, so re-running
+is idempotent: unchanged dreams are skipped, changed ones are merged in.
+State the API builds up after the load (chaos level, station stances,
+stances and levels rendered on demand) is kept.
+
+Usage: python scripts/load_world.py <world.json> [--dry-run] [--unlock-for USER_ID]
+    --dry-run prints the diff against Firestore without writing anything.
+    --unlock-for also adds every loaded slug to that user's unlocked_dreams.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from google.cloud import firestore
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from dream_analyzer import STANCE_KEYS, DreamHex, Station
+
+WORLD_OWNER = "world_builder"
+READ_CHUNK = 300
+WRITE_ATTEMPTS = 5
+DIFF_PATHS_SHOWN = 6
+# hex fields the API owns once a dream is live: interact moves the chaos level,
+# and background_* then shows that level instead of level 1
+RUNTIME_HEX_FIELDS = ("chaos_level", "station_stances")
+BACKGROUND_DISPLAY_FIELDS = ("background_frames", "background_tiers", "background_video", "background_tiles")
+
+
+# --- MAPPING ---
+def to_station(station):
+    # world_builder pre-renders every stance, so the whole stance index comes with the manifest
+    stance_assets = {
+        stance: {"frames": asset["file_paths"], "tiers": {}}
+        for stance, asset in station.get("generated_assets", {}).items()
+        if stance in STANCE_KEYS and asset.get("file_paths")
+    }
+    sprite_frames = stance_assets.get("idle", {}).get("frames", [])
+    return Station(
+        id=str(station["id"]),
+        position_index=station["position_index"],
+        entity_name=station.get("entity_name"),
+        state_start=station.get("visual_summary"),
+        entity_greeting=station.get("greeting"),
+        entity_monologue=station.get("written_description"),
+        interaction_options=station.get("interaction_options", []),
+        asset_status="COMPLETE" if sprite_frames else "PENDING",
+        sprite_frames=sprite_frames,
+        stance_assets=stance_assets,
+    )
+
+
+def to_doc(dream, version):
+    """One world.json dream entry as a `dreams/{slug}` document."""
+    ws = dream["world_state"]
+    description = ws.get("written_description") or f"{ws['base_noun']}, {ws['mood_modifier']}, {ws['ambient_verb']}"
+    # world_builder renders every chaos level, keyed "level_N" like hex.background_levels
+    levels = {
+        key: {"frames": asset["file_paths"], "tiers": {}, "video": None, "tiles": None}
+        for key, asset in ws.get("generated_assets", {}).items()
+        if key.startswith("level_") and asset.get("file_paths")
+    }
+    peaceful = levels.get("level_1", {}).get("frames", [])
+    hex_data = DreamHex(
+        title=dream["title"],
+        slug=dream["slug"],
+        description_360=description,
+        central_imagery=ws["base_noun"],
+        stations=[to_station(s) for s in dream["stations"]],
+        background_frames=peaceful,
+        background_status="COMPLETE" if peaceful else "PENDING",
+        background_levels=levels,
+    )
+    return {
+        "id": dream["slug"],
+        "owner_id": WORLD_OWNER,
+        "status": "COMPLETE",
+        "hex": hex_data.dict(),
+        "summary_short": description,
+        "summary_long": dream.get("original_dream_text", "").strip(),
+        "entities": [s.get("entity_name") for s in dream["stations"] if s.get("entity_name")],
+        "source": {
+            "manifest_version": version,
+            "world_state": {k: v for k, v in ws.items() if k != "generated_assets"},
+        },
+    }
+
+
+# --- RUNTIME STATE ---
+def keep_runtime(old, doc):
+    """
+    Readies `doc` for a merge write over the stored `old`: runtime hex fields
+    are left out (the merge keeps the stored values), and since hex.stations
+    is an array the merge replaces, stances rendered on demand are carried
+    into the manifest's stations.
+    """
+    hex_old, hex_new = old.get("hex", {}), doc["hex"]
+    runtime = RUNTIME_HEX_FIELDS
+    if hex_old.get("chaos_level", 1) != 1:
+        runtime += BACKGROUND_DISPLAY_FIELDS
+    for field in runtime:
+        if field in hex_old:
+            hex_new.pop(field, None)
+    old_stations = {s.get("id"): s for s in hex_old.get("stations", [])}
+    for station in hex_new["stations"]:
+        rendered = old_stations.get(station["id"], {}).get("stance_assets", {})
+        station["stance_assets"] = {**rendered, **station["stance_assets"]}
+    return doc
+
+
+def merged(old, new):
+    """What set(new, merge=True) leaves stored: maps merge key by key, anything else is replaced."""
+    if isinstance(old, dict) and isinstance(new, dict) and new:
+        return {**old, **{k: merged(old.get(k), v) for k, v in new.items()}}
+    return new
+
+
+# --- DIFF ---
+def flatten(value, prefix=""):
+    if isinstance(value, dict) and value:
+        for k, v in value.items():
+            yield from flatten(v, f"{prefix}{k}.")
+    elif isinstance(value, list) and value:
+        for i, v in enumerate(value):
+            yield from flatten(v, f"{prefix}{i}.")
+    else:
+        yield prefix[:-1], value
+
+
+def diff_doc(old, new):
+    """Dotted paths whose values differ between two documents."""
+    a, b = dict(flatten(old)), dict(flatten(new))
+    return sorted(p for p in a.keys() | b.keys() if a.get(p, object()) != b.get(p, object()))
+
+
+def fetch_existing(db, slugs):
+    existing = {}
+    refs = [db.collection("dreams").document(s) for s in slugs]
+    for i in range(0, len(refs), READ_CHUNK):
+        for snap in db.get_all(refs[i:i + READ_CHUNK]):
+            if snap.exists:
+                existing[snap.id] = snap.to_dict()
+    return existing
+
+
+# --- WRITE ---
+def write_docs(db, docs):
+    writer = db.bulk_writer()
+    failed = []
+
+    def on_error(error, bulk_writer):
+        if error.attempts < WRITE_ATTEMPTS:
+            return True
+        print(f"❌ {error.reference.id}: {error.message}")
+        failed.append(error.reference.id)
+        return False
+
+    writer.on_write_error(on_error)
+    for doc in docs:
+        writer.set(db.collection("dreams").document(doc["id"]), doc, merge=True)
+    writer.close()
+    return failed
+
+
+def run(path, dry_run=False, unlock_for=None):
+    with open(path) as f:
+        world = json.load(f)
+    docs = [to_doc(d, world.get("version")) for d in world.get("dreams", [])]
+
+    db = firestore.Client(project=os.environ.get("GCP_PROJECT_ID"))
+    started = time.time()
+    existing = fetch_existing(db, [d["id"] for d in docs])
+
+    todo = []
+    for doc in docs:
+        old = existing.get(doc["id"])
+        if old is None:
+            print(f"  + {doc['id']}")
+            todo.append(doc)
+            continue
+        keep_runtime(old, doc)
+        changed = diff_doc(old, merged(old, doc))
+        if changed:
+            more = f" (+{len(changed) - DIFF_PATHS_SHOWN} more)" if len(changed) > DIFF_PATHS_SHOWN else ""
+            print(f"  ~ {doc['id']}: {', '.join(changed[:DIFF_PATHS_SHOWN])}{more}")
+            todo.append(doc)
+    print(f"📋 {len(docs)} dreams | {len(docs) - len(existing)} new | "
+          f"{len(todo) - (len(docs) - len(existing))} changed | {len(docs) - len(todo)} unchanged")
+
+    if dry_run:
+        print("🔍 Dry run, nothing written.")
+        return
+
+    failed = write_docs(db, todo) if todo else []
+    if unlock_for:
+        db.collection("users").document(unlock_for).set(
+            {"unlocked_dreams": firestore.ArrayUnion([d["id"] for d in docs])}, merge=True)
+    print(f"✅ Wrote {len(todo) - len(failed)} dreams in {time.time() - started:.1f}s ({len(failed)} failed)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a world_builder world.json into Firestore.")
+    parser.add_argument("world_json")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--unlock-for", metavar="USER_ID")
+    args = parser.parse_args()
+    run(args.world_json, dry_run=args.dry_run, unlock_for=args.unlock_for)
@@ -336,11 +336,26 @@ import torch
 import io
 from google.colab import files
 import json
+import abc
+import hashlib
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # --- SETTINGS ---
 GCS_BUCKET_NAME = "dreamhex-assets-dreamhex"
 GENERATE_FULL_MATRIX = False
 
+# Incremental mode keeps dream_hex_build/ between runs and skips every unit
+# (one background level, or one station stance) already recorded in
+# build_manifest.json with the same input hash. Set False for a clean rebuild.
+INCREMENTAL_BUILD = True
+BUILD_MANIFEST = "build_manifest.json"
+# Bump to invalidate every unit when generate_dream_scene's style/settings change
+GENERATOR_VERSION = "v1"
+# Which painter rendered a unit: "local" (generate_dream_scene), "modal" or "stub"
+LOCAL_PAINTER = "local"
+
 CHAPTER_1_TEXT = """
 I, John Dee, floated in a space between thought and waking light. A cool, pale glow spread through the room, and a sphere formed in the air. It pulsed with inner geometry, lines and spirals folding into one another like living mathematics. As it drew nearer, words appeared in my mind. They were not spoken. They rose like writing on an invisible sheet.
 """
@@ -362,32 +377,347 @@ CHAOS_LEVELS = {
     4: "chaotic, sharp, dark"
 }
 
-# --- LOCAL SAVING ---
-def save_frame_sequence(image_list, folder_path, file_prefix, file_format="PNG"):
+# --- EXPORT ---
+# Where finished frames and world.json go. Frames are encoded in memory and
+# handed straight to the sink, nothing is staged on disk first:
+#   "local":  dream_hex_build/ directory (default; needed for incremental skips)
+#   "gcs":    concurrent uploads to GCS_BUCKET_NAME, so the baked URLs resolve
+#   "zip":    streamed into dreamhex_world.zip, downloaded when the build ends
+#   "memory": GCS sink over an in-memory bucket, for dry runs without credentials;
+#             nothing it records is written to build_manifest.json
+EXPORT_SINK = "local"
+EXPORT_ZIP = "dreamhex_world.zip"
+GCS_UPLOAD_WORKERS = 8
+GCS_UPLOAD_RETRIES = 3
+
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+def public_url(key):
+    return f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{key}"
+
+def _done(value=None):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+class ExportSink(abc.ABC):
+    """
+    Destination for exported files. `put` returns a Future; asset keys are
+    "<slug>/<file>" (the GCS object name) and are placed under `asset_prefix`.
+    """
+    asset_prefix = "assets/"
+    remote = False  # True when nothing lands on local disk
+    persistent = True  # False for dry runs: their units never reach build_manifest.json
+
+    def asset(self, key):
+        return self.asset_prefix + key
+
+    @abc.abstractmethod
+    def put(self, path, data, content_type):
+        """Stores `data` under `path` and returns a Future that resolves once it has landed."""
+
+    def exists(self, path):
+        return False
+
+    def close(self):
+        pass
+
+class LocalDirSink(ExportSink):
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, path, data, content_type):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write-then-rename: a crash mid-save never leaves a truncated frame behind
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, full_path)
+        return _done(path)
+
+    def exists(self, path):
+        return os.path.exists(os.path.join(self.root, path))
+
+class GCSSink(ExportSink):
+    """Uploads on a thread pool; `bucket` can be any object with GCS's blob() API."""
+    asset_prefix = ""
+    remote = True
+
+    def __init__(self, bucket_name=GCS_BUCKET_NAME, bucket=None, workers=GCS_UPLOAD_WORKERS, retries=GCS_UPLOAD_RETRIES):
+        if bucket is None:
+            from google.cloud import storage
+            bucket = storage.Client().bucket(bucket_name)
+        self.bucket = bucket
+        self.retries = retries
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gcs")
+        # Caps the encoded bytes held in memory while uploads catch up
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.uploaded = 0
+        self.bytes = 0
+
+    def _upload(self, path, data, content_type):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.bucket.blob(path).upload_from_string(data, content_type=content_type)
+                    break
+                except Exception as e:
+                    if attempt == self.retries: raise
+                    print(f"⚠️ Upload of {path} failed ({e}), retrying...")
+                    time.sleep(0.5 * (attempt + 1))
+            with self.lock:
+                self.uploaded += 1
+                self.bytes += len(data)
+            return path
+        finally:
+            self.slots.release()
+
+    def put(self, path, data, content_type):
+        self.slots.acquire()
+        return self.pool.submit(self._upload, path, data, content_type)
+
+    def exists(self, path):
+        return self.bucket.blob(path).exists()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        print(f"☁️ Uploaded {self.uploaded} objects ({self.bytes / 1e6:.1f} MB) to {GCS_BUCKET_NAME}")
+
+class MemoryBucket:
+    """In-memory stand-in for a GCS bucket: {name: (bytes, content_type)}."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def blob(self, name):
+        return MemoryBlob(self, name)
+
+class MemoryBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.objects[self.name] = (bytes(data), content_type)
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+class MemorySink(GCSSink):
+    """Dry run: the GCS upload path into a MemoryBucket, recorded as neither remote nor persistent."""
+    remote = False
+    persistent = False
+
+    def __init__(self):
+        super().__init__(bucket=MemoryBucket())
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        print(f"🧪 Dry run: {self.uploaded} objects ({self.bytes / 1e6:.1f} MB) kept in memory, build manifest untouched")
+
+class ZipSink(ExportSink):
+    """
+    Streams entries into one archive as they arrive. An archive left by an
+    earlier run is kept as the previous build: its entries count as existing,
+    and any this run doesn't rewrite are carried over on close.
+    """
+
+    def __init__(self, path=EXPORT_ZIP):
+        self.path = path
+        self.previous = None
+        prev_path = f"{path}.prev"
+        # A leftover .prev means the last run died before close; its archive is the partial one
+        if os.path.exists(path) and not os.path.exists(prev_path):
+            os.replace(path, prev_path)
+        if os.path.exists(prev_path):
+            self.previous = zipfile.ZipFile(prev_path, "r")
+        self.zip = zipfile.ZipFile(path, "w")
+        self.lock = threading.Lock()
+        self.names = set()
+
+    def put(self, path, data, content_type):
+        # JPEG/PNG are already compressed; deflating them again only costs time
+        compress = zipfile.ZIP_STORED if content_type.startswith("image/") else zipfile.ZIP_DEFLATED
+        with self.lock:
+            self.zip.writestr(path, data, compress_type=compress)
+            self.names.add(path)
+        return _done(path)
+
+    def exists(self, path):
+        if path in self.names: return True
+        return self.previous is not None and path in self.previous.NameToInfo
+
+    def close(self):
+        carried = 0
+        if self.previous is not None:
+            for info in self.previous.infolist():
+                if info.filename in self.names: continue
+                self.zip.writestr(info, self.previous.read(info))
+                carried += 1
+            self.previous.close()
+            os.remove(self.previous.filename)
+        self.zip.close()
+        print(f"📦 Wrote {len(self.names)} files to {self.path} ({carried} carried over from the last build)")
+        files.download(self.path)
+
+def open_sink(base_dir, kind=EXPORT_SINK):
+    if kind == "local": return LocalDirSink(base_dir)
+    if kind == "gcs": return GCSSink()
+    if kind == "zip": return ZipSink()
+    if kind == "memory": return MemorySink()
+    raise ValueError(f"Unknown EXPORT_SINK '{kind}'")
+
+def save_frame_sequence(image_list, slug, file_prefix, file_format, sink):
+    """Encodes frames in memory, hands them to the sink and returns their public URLs."""
     saved_urls = []
-    os.makedirs(folder_path, exist_ok=True)
-    gcs_slug = os.path.basename(folder_path)
-
+    pending = []
     for i, img in enumerate(image_list):
-        filename = f"{file_prefix}_{i}.{file_format.lower()}"
-        full_path = os.path.join(folder_path, filename)
-
+        key = f"{slug}/{file_prefix}_{i}.{file_format.lower()}"
+        buf = io.BytesIO()
         if file_format == "JPEG":
-            img.convert("RGB").save(full_path, quality=85)
+            img.convert("RGB").save(buf, format="JPEG", quality=85)
         else:
-            img.save(full_path, format="PNG")
+            img.save(buf, format="PNG")
+        pending.append(sink.put(sink.asset(key), buf.getvalue(), CONTENT_TYPES[file_format]))
+        saved_urls.append(public_url(key))
 
-        public_url = f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{gcs_slug}/{filename}"
-        saved_urls.append(public_url)
+    # Frames upload concurrently, but the unit only counts as saved once all of them have landed
+    for fut in pending: fut.result()
     return saved_urls
 
+def frame_keys(slug, file_prefix, file_format, count):
+    return [f"{slug}/{file_prefix}_{i}.{file_format.lower()}" for i in range(count)]
+
+# --- INCREMENTAL BUILD ---
+def unit_hash(*parts, painter=LOCAL_PAINTER):
+    """Input hash of one build unit: prompt + generator settings + the painter that rendered it."""
+    ident = [GENERATOR_VERSION, *map(str, parts)]
+    # Other painters render different pixels (Modal's worker, the CPU stub), so their units never
+    # satisfy each other; the local pipe keeps the original hash so existing manifests stay valid
+    if painter != LOCAL_PAINTER: ident.append(painter)
+    return hashlib.sha256("|".join(ident).encode()).hexdigest()[:16]
+
+def write_json_atomic(path, data):
+    # Write-then-rename so an interrupted run never leaves a half-written manifest
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def load_build_manifest(base_dir):
+    path = os.path.join(base_dir, BUILD_MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"analyses": {}, "units": {}}
+
+def save_build_manifest(build, base_dir):
+    # Dry runs keep their manifest in memory, so a later real run never skips their units
+    if build.get("dry_run"): return
+    write_json_atomic(os.path.join(base_dir, BUILD_MANIFEST), build)
+
+def open_build(base_dir):
+    """Build manifest and export sink for one run."""
+    build = load_build_manifest(base_dir)
+    sink = open_sink(base_dir)
+    if not sink.persistent: build["dry_run"] = True
+    return build, sink
+
+def unit_done(build, key, input_hash, sink, keys_expected):
+    unit = build["units"].get(key)
+    if not unit or unit["hash"] != input_hash: return False
+    # Remote units were uploaded straight to GCS, nothing to check locally
+    return unit.get("remote", False) or all(sink.exists(sink.asset(k)) for k in keys_expected)
+
+# The pipelined builder records units from several threads
+BUILD_LOCK = threading.RLock()
+
+def record_unit(build, base_dir, key, input_hash, urls, remote=False):
+    with BUILD_LOCK:
+        build["units"][key] = {"hash": input_hash, "urls": urls, "remote": remote, "finished_at": time.time()}
+        save_build_manifest(build, base_dir)
+
+def get_analysis(text, build, base_dir):
+    """analyze_dream, cached in the build manifest per dream text. Stations capped at 6."""
+    text_key = unit_hash(text)
+    cached = build["analyses"].get(text_key)
+    if cached:
+        hex_data_dict = {
+            'world_state': WorldState(**cached['world_state']),
+            'stations': [Station(**s) for s in cached['stations']],
+            'title': cached['title'],
+            'slug': cached['slug']
+        }
+    else:
+        hex_data_dict = analyze_dream(text)
+        if not hex_data_dict: return None
+        with BUILD_LOCK:
+            build["analyses"][text_key] = {
+                'world_state': hex_data_dict['world_state'].model_dump(),
+                'stations': [s.model_dump() for s in hex_data_dict['stations']],
+                'title': hex_data_dict['title'],
+                'slug': hex_data_dict['slug']
+            }
+            save_build_manifest(build, base_dir)
+
+    # Enforce max entities
+    if len(hex_data_dict['stations']) > 6:
+        print(f"⚠️ Too many entities ({len(hex_data_dict['stations'])}). Truncating to 6.")
+        hex_data_dict['stations'] = hex_data_dict['stations'][:6]
+    return hex_data_dict
+
+def bg_prompt_for(hex_data, level_idx):
+    # Combine base noun + mood + specific chaos modifier
+    return f"{hex_data.base_noun}, {hex_data.mood_modifier}, {hex_data.ambient_verb}, {CHAOS_LEVELS[level_idx]}"
+
+def sprite_prompt_for(station, stance_name):
+    stance_mod = getattr(station.stance_prompts, stance_name, "neutral")
+    return f"{station.base_noun}, {stance_mod}"
+
+def manifest_entry(hex_data_dict, text):
+    return {
+        'title': hex_data_dict['title'],
+        'slug': hex_data_dict['slug'],
+        'world_state': hex_data_dict['world_state'].model_dump(),
+        'stations': [s.model_dump() for s in hex_data_dict['stations']],
+        'original_dream_text': text
+    }
+
+# --- SHARDED MANIFEST ---
+# Built by api/world_shards.py, the same code the API serves the index with.
+# Run from a checkout of the repo, or upload world_shards.py next to the notebook.
+import sys
+for _api_dir in ("api", "../api", "dreamhex/api"):
+    if os.path.exists(os.path.join(_api_dir, "world_shards.py")):
+        sys.path.insert(0, os.path.abspath(_api_dir))
+        break
+import world_shards
+
+WORLD_SHARDS = True
+
+def finalize_build(manifest, sink):
+    world_json = json.dumps(manifest, indent=2)
+    writes = [sink.put("world.json", world_json.encode(), "application/json")]
+    if WORLD_SHARDS:
+        _, index_body, shards = world_shards.shard_world(manifest)
+        writes += [sink.put(world_shards.shard_path(name), body, "application/json") for name, body in shards.items()]
+    for fut in writes: fut.result()
+    if WORLD_SHARDS:
+        # Index last, so it never points at a shard that hasn't landed
+        sink.put(world_shards.index_path(), index_body, "application/json").result()
+        print(f"🗂️ {len(shards)} shards, index {len(index_body) / 1024:.1f} KB (world.json {len(world_json) / 1024:.1f} KB)")
+    sink.close()
+    return world_json
+
 # --- RUNNER ---
 def run_world_builder():
     base_dir = "dream_hex_build"
-    assets_dir = os.path.join(base_dir, "assets")
 
-    if os.path.exists(base_dir): shutil.rmtree(base_dir)
-    os.makedirs(assets_dir)
+    if not INCREMENTAL_BUILD and os.path.exists(base_dir): shutil.rmtree(base_dir)
+    os.makedirs(base_dir, exist_ok=True)
+    build, sink = open_build(base_dir)
 
     manifest = {"version": "3.4-multi-condition", "dreams": []}
     print(f"🏭 Starting World Builder (Multi-Condition Mode)...")
@@ -396,39 +726,41 @@ def run_world_builder():
         gc.collect()
         torch.cuda.empty_cache()
 
-        # 1. ANALYZE
-        hex_data_dict = analyze_dream(text)
+        # 1. ANALYZE (cached per dream text, so resumed runs keep the same prompts)
+        hex_data_dict = get_analysis(text, build, base_dir)
         if not hex_data_dict: continue
         print("got hex_data_dict for ", hex_data_dict['slug'])
         hex_data = hex_data_dict['world_state']
         stations = hex_data_dict['stations']
         slug = hex_data_dict['slug']
 
-        # Enforce max entities
-        if len(stations) > 6:
-            print(f"⚠️ Too many entities ({len(stations)}). Truncating to 6.")
-            stations = stations[:6]
-
-        dream_folder = os.path.join(assets_dir, slug)
-
         # 3. BACKGROUND GENERATION (Loop 4 Conditions)
         print(f"\n🎨 BG: {hex_data.base_noun} (Generating 4 Chaos Levels)...")
 
         # Loop through levels 1 to 4
         for level_idx in range(1, 5):
             chaos_prompt = CHAOS_LEVELS[level_idx]
-            # Combine base noun + mood + specific chaos modifier
-            bg_prompt = f"{hex_data.base_noun}, {hex_data.mood_modifier}, {hex_data.ambient_verb}, {chaos_prompt}"
-
-            print(f"   - Level {level_idx}: {chaos_prompt}...")
-
-            # Generate 4 frames per condition
-            bg_frames = generate_dream_scene(bg_prompt, type="pano", frames=4)
+            bg_prompt = bg_prompt_for(hex_data, level_idx)
 
             # Save with level indicator in filename
             # e.g. slug_bg_lvl1_0.jpg
             prefix = f"{slug}_bg_lvl{level_idx}"
-            bg_urls = save_frame_sequence(bg_frames, dream_folder, prefix, "JPEG")
+            unit_key = f"bg/{slug}/{level_idx}"
+            input_hash = unit_hash(bg_prompt, "pano", 4)
+
+            if unit_done(build, unit_key, input_hash, sink, frame_keys(slug, prefix, "JPEG", 4)):
+                print(f"   - Level {level_idx}: ✔ up to date, skipping")
+                bg_urls = build["units"][unit_key]["urls"]
+            else:
+                print(f"   - Level {level_idx}: {chaos_prompt}...")
+
+                # Generate 4 frames per condition
+                bg_frames = generate_dream_scene(bg_prompt, type="pano", frames=4)
+                bg_urls = save_frame_sequence(bg_frames, slug, prefix, "JPEG", sink)
+                record_unit(build, base_dir, unit_key, input_hash, bg_urls, remote=sink.remote)
+
+                if level_idx == 1:
+                    display(bg_frames[0].resize((300, 150))) # Display only the first peaceful frame as preview
 
             # Store in the dictionary
             # Key format: "level_1", "level_2", etc.
@@ -437,9 +769,6 @@ def run_world_builder():
                 full_prompt=bg_prompt
             )
 
-            if level_idx == 1:
-                display(bg_frames[0].resize((300, 150))) # Display only the first peaceful frame as preview
-
         # 4. ENTITY GENERATION (Loop through all stations)
         print(f"\n🧚 Generating Entities ({len(stations)} total)...")
 
@@ -448,17 +777,22 @@ def run_world_builder():
 
             # Loop through the 7 fixed stances
             for stance_name in STANCE_KEYS:
-                stance_mod = getattr(station.stance_prompts, stance_name, "neutral")
-
                 # Construct Prompt
-                full_prompt = f"{station.base_noun}, {stance_mod}"
-
-                # Generate 4 frames
-                frames = generate_dream_scene(full_prompt, type="sprite", frames=4)
+                full_prompt = sprite_prompt_for(station, stance_name)
 
-                # Save
                 prefix = f"{slug}_{station.id}_{stance_name}"
-                paths = save_frame_sequence(frames, dream_folder, prefix, "PNG")
+                unit_key = f"sprite/{slug}/{station.id}/{stance_name}"
+                input_hash = unit_hash(full_prompt, "sprite", 4)
+
+                if unit_done(build, unit_key, input_hash, sink, frame_keys(slug, prefix, "PNG", 4)):
+                    paths = build["units"][unit_key]["urls"]
+                else:
+                    # Generate 4 frames
+                    frames = generate_dream_scene(full_prompt, type="sprite", frames=4)
+
+                    # Save
+                    paths = save_frame_sequence(frames, slug, prefix, "PNG", sink)
+                    record_unit(build, base_dir, unit_key, input_hash, paths, remote=sink.remote)
 
                 # Store in Data
                 generated_asset_obj = GeneratedAsset(file_paths=paths, full_prompt=full_prompt)
@@ -469,23 +803,309 @@ def run_world_builder():
                 torch.cuda.empty_cache()
 
         # 5. EXPORT
-        final_manifest_entry = {
-            'title': hex_data_dict['title'],
-            'slug': hex_data_dict['slug'],
-            'world_state': hex_data.model_dump(),
-            'stations': [s.model_dump() for s in stations],
-            'original_dream_text': text
-        }
-        manifest["dreams"].append(final_manifest_entry)
+        manifest["dreams"].append(manifest_entry(hex_data_dict, text))
 
     # --- FINAL SAVE ---
-    with open(os.path.join(base_dir, "world.json"), "w") as f:
-        json.dump(manifest, f, indent=2)
+    return finalize_build(manifest, sink)
+# @title 5. Parallel Fan-Out Build (Modal .starmap or local process pool)
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-    print("\n📦 Zipping...")
-    shutil.make_archive("dreamhex_world", 'zip', base_dir)
-    files.download("dreamhex_world.zip")
+# --- SETTINGS ---
+# "serial" runs cell 4 as before; "modal" fans the asset matrix out to the
+# deployed Pano/SpritePainter pools; "local" uses a process pool with the stub
+# painter below (for testing the fan-out without a GPU); "pipelined" runs the
+# stage pipeline in cell 6.
+BUILD_MODE = "serial"
+LOCAL_WORKERS = 4
+JOB_RETRIES = 2
+FRAMES_PER_UNIT = 4
+
+def plan_matrix(hex_data_dict, painter=LOCAL_PAINTER):
+    """Every (level) background and (station, stance) sprite of one dream as an independent job."""
+    slug = hex_data_dict['slug']
+    jobs = []
+    for level_idx in CHAOS_LEVELS:
+        prompt = bg_prompt_for(hex_data_dict['world_state'], level_idx)
+        jobs.append({
+            "key": f"bg/{slug}/{level_idx}", "slug": slug, "type": "pano", "prompt": prompt,
+            "hash": unit_hash(prompt, "pano", FRAMES_PER_UNIT, painter=painter),
+            "prefix": f"{slug}_bg_lvl{level_idx}", "format": "JPEG"
+        })
+    for station in hex_data_dict['stations']:
+        for stance_name in STANCE_KEYS:
+            prompt = sprite_prompt_for(station, stance_name)
+            jobs.append({
+                "key": f"sprite/{slug}/{station.id}/{stance_name}", "slug": slug, "type": "sprite", "prompt": prompt,
+                "hash": unit_hash(prompt, "sprite", FRAMES_PER_UNIT, painter=painter),
+                "prefix": f"{slug}_{station.id}_{stance_name}", "format": "PNG"
+            })
+    return jobs
+
+def stub_painter(prompt, type, frames):
+    """CPU stand-in for generate_dream_scene: flat frames tinted by the prompt hash."""
+    size = (768, 384) if type == "pano" else (320, 320)
+    seed = int(hashlib.md5(prompt.encode()).hexdigest()[:6], 16)
+    return [Image.new("RGB", size, ((seed >> 16) & 255, (seed >> 8) & 255, (seed + 40 * i) & 255)) for i in range(frames)]
+
+def _run_local_job(job):
+    # Top-level so the process pool can pickle it; frames are saved by the parent, which owns the sink
+    return stub_painter(job["prompt"], job["type"], FRAMES_PER_UNIT)
+
+def job_done(build, job, sink):
+    return unit_done(build, job["key"], job["hash"], sink, frame_keys(job["slug"], job["prefix"], job["format"], FRAMES_PER_UNIT))
+
+def run_jobs_local(jobs, on_done, sink, workers=LOCAL_WORKERS, retries=JOB_RETRIES):
+    attempts = {job["key"]: 0 for job in jobs}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_run_local_job, job): job for job in jobs}
+        while pending:
+            for fut in as_completed(list(pending)):
+                job = pending.pop(fut)
+                try:
+                    on_done(job, save_frame_sequence(fut.result(), job["slug"], job["prefix"], job["format"], sink))
+                except Exception as e:
+                    attempts[job["key"]] += 1
+                    if attempts[job["key"]] > retries:
+                        print(f"❌ {job['key']} failed after {retries} retries: {e}")
+                        on_done(job, None)
+                    else:
+                        print(f"⚠️ {job['key']} failed ({e}), retrying...")
+                        pending[pool.submit(_run_local_job, job)] = job
+
+def run_jobs_modal(jobs, on_done, retries=JOB_RETRIES):
+    """Fans jobs out to the deployed painters; frames are uploaded to GCS by the worker."""
+    import modal
+
+    painters = {
+        "pano": modal.Cls.from_name("dreamhex-worker", "PanoPainter")(),
+        "sprite": modal.Cls.from_name("dreamhex-worker", "SpritePainter")(),
+    }
+    remaining = list(jobs)
+    for attempt in range(retries + 1):
+        failed = []
+        for job_type, painter in painters.items():
+            batch = [j for j in remaining if j["type"] == job_type]
+            if not batch: continue
+            args = [(j["prompt"], None, j["type"], FRAMES_PER_UNIT, f"world/{j['slug']}/{j['prefix']}") for j in batch]
+            for job, result in zip(batch, painter.generate_frames.starmap(args, return_exceptions=True)):
+                if isinstance(result, Exception):
+                    print(f"⚠️ {job['key']} failed ({result})")
+                    failed.append(job)
+                else:
+                    on_done(job, result)
+        if not failed: return
+        remaining = failed
+        if attempt < retries: print(f"🔁 Retrying {len(failed)} jobs...")
+    for job in remaining:
+        on_done(job, None)
+
+def assemble_dream(hex_data_dict, text, build, painter=LOCAL_PAINTER):
+    """Manifest entry built from recorded units, in level/station/stance order."""
+    # Units left over from another painter (e.g. stub frames) are not shipped
+    units = {job["key"]: build["units"][job["key"]] for job in plan_matrix(hex_data_dict, painter)
+             if build["units"].get(job["key"], {}).get("hash") == job["hash"]}
+    slug = hex_data_dict['slug']
+    world_state = hex_data_dict['world_state']
+    for level_idx in CHAOS_LEVELS:
+        unit = units.get(f"bg/{slug}/{level_idx}")
+        if unit:
+            world_state.generated_assets[f"level_{level_idx}"] = GeneratedAsset(
+                file_paths=unit["urls"], full_prompt=bg_prompt_for(world_state, level_idx))
+    for station in hex_data_dict['stations']:
+        for stance_name in STANCE_KEYS:
+            unit = units.get(f"sprite/{slug}/{station.id}/{stance_name}")
+            if unit:
+                station.generated_assets[stance_name] = GeneratedAsset(
+                    file_paths=unit["urls"], full_prompt=sprite_prompt_for(station, stance_name))
+    return manifest_entry(hex_data_dict, text)
+
+def run_world_builder_parallel(backend=BUILD_MODE):
+    base_dir = "dream_hex_build"
+    os.makedirs(base_dir, exist_ok=True)
+    build, sink = open_build(base_dir)
+    print(f"🏭 Starting World Builder (Parallel Fan-Out, backend={backend})...")
+
+    # 1. ANALYZE every dream, then plan the whole matrix up front
+    dreams = []
+    for text in BATCH_INPUT:
+        hex_data_dict = get_analysis(text, build, base_dir)
+        if hex_data_dict: dreams.append((text, hex_data_dict))
+
+    # The "local" backend renders with stub_painter, never real frames
+    painter = "modal" if backend == "modal" else "stub"
+    all_jobs = [job for _, d in dreams for job in plan_matrix(d, painter)]
+    todo = [j for j in all_jobs if not job_done(build, j, sink)]
+    print(f"📋 {len(all_jobs)} units, {len(all_jobs) - len(todo)} up to date, {len(todo)} to render")
+
+    # 2. RENDER in any order; progress + checkpoint as each unit lands
+    started = time.time()
+    done_count = [0]
+    def on_done(job, urls):
+        done_count[0] += 1
+        status = "✔" if urls else "✘"
+        print(f"   [{done_count[0]}/{len(todo)}] {status} {job['key']} ({time.time() - started:.0f}s)")
+        if urls:
+            record_unit(build, base_dir, job["key"], job["hash"], urls, remote=backend == "modal" or sink.remote)
+
+    if todo:
+        if backend == "modal":
+            run_jobs_modal(todo, on_done)
+        else:
+            run_jobs_local(todo, on_done, sink)
+
+    # 3. ASSEMBLE in canonical order (levels, stations, stances), independent of completion order
+    manifest = {"version": "3.4-multi-condition", "dreams": [assemble_dream(d, text, build, painter) for text, d in dreams]}
+    return finalize_build(manifest, sink)
 
-    return json.dumps(manifest, indent=2)
+# @title 6. Stage-Pipelined Build (analysis, render, save and export overlap)
+import queue
+import threading
+import time
 
-run_world_builder()
\ No newline at end of file
+# --- SETTINGS ---
+PIPELINE_QUEUE_SIZE = 4           # bounded queues: a slow stage back-pressures its producers
+STAGE_WORKERS = {"analyze": 2, "background": 1, "sprites": 1, "save": 4, "export": 1}
+
+# Both render stages share the one local pipe
+GPU_LOCK = threading.Lock()
+_STOP = object()
+
+class Stage:
+    """A pool of threads draining one bounded queue, with busy-time accounting."""
+
+    def __init__(self, name, fn, workers=1, maxsize=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.busy = 0.0
+        self.items = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"{self.name}-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def put(self, item):
+        self.inbox.put(item)
+
+    def _loop(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP: return
+            t0 = time.perf_counter()
+            try:
+                self.fn(item)
+            except Exception as e:
+                print(f"❌ [{self.name}] {e}")
+                with self._lock: self.errors += 1
+            with self._lock:
+                self.busy += time.perf_counter() - t0
+                self.items += 1
+
+    def close(self):
+        # Upstream stages are closed first, so nothing new can arrive after the STOPs
+        for _ in self._threads: self.inbox.put(_STOP)
+        for t in self._threads: t.join()
+
+    def report(self, wall):
+        util = self.busy / (wall * self.workers) if wall else 0.0
+        return f"   {self.name:10s} | {self.workers} workers | {self.items:4d} items | {self.errors} errors | busy {self.busy:7.1f}s | util {100 * util:5.1f}%"
+
+def run_world_builder_pipelined():
+    base_dir = "dream_hex_build"
+    os.makedirs(base_dir, exist_ok=True)
+    build, sink = open_build(base_dir)
+    print(f"🏭 Starting World Builder (Stage Pipeline)...")
+
+    entries = {}
+    pending = {}
+    pending_lock = threading.Lock()
+
+    def unit_finished(dream):
+        with pending_lock:
+            pending[dream["index"]] -= 1
+            ready = pending[dream["index"]] == 0
+        if ready: export.put(dream)
+
+    def render(job, dream, stage_out):
+        try:
+            with GPU_LOCK:
+                frames = generate_dream_scene(job["prompt"], type=job["type"], frames=FRAMES_PER_UNIT)
+        except Exception as e:
+            # The unit stays unrecorded, so the next incremental run picks it up again
+            print(f"❌ {job['key']} failed: {e}")
+            unit_finished(dream)
+            return
+        stage_out.put((job, frames, dream))
+
+    # --- STAGE FUNCTIONS ---
+    def do_analyze(item):
+        index, text = item
+        d = get_analysis(text, build, base_dir)
+        if not d: return
+        jobs = plan_matrix(d)
+        todo = [j for j in jobs if not job_done(build, j, sink)]
+        dream = {"index": index, "text": text, "data": d, "todo": todo}
+        with pending_lock: pending[index] = len(todo)
+        print(f"🔮 {d['slug']}: {len(todo)}/{len(jobs)} units to render")
+        if not todo:
+            export.put(dream)
+            return
+        background.put(dream)
+
+    def do_background(dream):
+        for job in dream["todo"]:
+            if job["type"] == "pano": render(job, dream, save)
+        sprites.put(dream)
+
+    def do_sprites(dream):
+        for job in dream["todo"]:
+            if job["type"] == "sprite": render(job, dream, save)
+
+    def do_save(item):
+        job, frames, dream = item
+        try:
+            urls = save_frame_sequence(frames, job["slug"], job["prefix"], job["format"], sink)
+            record_unit(build, base_dir, job["key"], job["hash"], urls, remote=sink.remote)
+        finally:
+            unit_finished(dream)
+
+    def do_export(dream):
+        entries[dream["index"]] = assemble_dream(dream["data"], dream["text"], build)
+        print(f"📦 {dream['data']['slug']} exported")
+
+    export = Stage("export", do_export, STAGE_WORKERS["export"])
+    save = Stage("save", do_save, STAGE_WORKERS["save"])
+    sprites = Stage("sprites", do_sprites, STAGE_WORKERS["sprites"])
+    background = Stage("background", do_background, STAGE_WORKERS["background"])
+    analyze = Stage("analyze", do_analyze, STAGE_WORKERS["analyze"])
+    stages = [analyze, background, sprites, save, export]
+
+    started = time.perf_counter()
+    for stage in stages: stage.start()
+    for item in enumerate(BATCH_INPUT): analyze.put(item)
+    for stage in stages: stage.close()
+    wall = time.perf_counter() - started
+
+    print(f"\n⏱️ Stage utilization over {wall:.1f}s wall time:")
+    for stage in stages: print(stage.report(wall))
+
+    # Dreams finish out of order; keep BATCH_INPUT order in the manifest
+    manifest = {"version": "3.4-multi-condition", "dreams": [entries[i] for i in sorted(entries)]}
+    return finalize_build(manifest, sink)
+
+# --- RUN ---
+if BUILD_MODE == "serial":
+    run_world_builder()
+elif BUILD_MODE == "pipelined":
+    run_world_builder_pipelined()
+else:
+    run_world_builder_parallel()
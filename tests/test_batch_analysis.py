@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from batch_analysis import BatchAnalysis, estimate_tokens, report_id
+
+
+class FakeOpenAI:
+    """
+    Stand-in for client.files and client.batches. A batch moves one step per
+    retrieve and completes on the third. The first batch fails outright; `flaky`
+    reports error, return invalid JSON or go missing on their first attempt,
+    `broken` ones on every attempt.
+    """
+
+    def __init__(self, flaky=(), broken=()):
+        self.flaky, self.broken = set(flaky), set(broken)
+        self.uploads, self.created, self.attempts = {}, {}, {}
+        self.max_open_lines = 0
+        self.files = SimpleNamespace(create=self.create_file, content=self.file_content)
+        self.batches = SimpleNamespace(create=self.create_batch, retrieve=self.retrieve)
+
+    async def create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = file[1]
+        return SimpleNamespace(id=file_id)
+
+    async def file_content(self, file_id):
+        return SimpleNamespace(text=self.uploads[file_id].decode())
+
+    async def create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self.created)}"
+        lines = self.uploads[input_file_id].decode().splitlines()
+        self.created[batch_id] = {"lines": lines, "steps": 0, "status": "validating",
+                                  "output_file_id": None, "error_file_id": None, "errors": None}
+        open_lines = sum(len(b["lines"]) for b in self.created.values() if b["status"] == "validating")
+        self.max_open_lines = max(self.max_open_lines, open_lines)
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    async def retrieve(self, batch_id):
+        batch = self.created[batch_id]
+        batch["steps"] += 1
+        if batch["status"] == "validating":
+            if batch_id == "batch-0":
+                batch.update(status="failed", errors={"data": [{"code": "token_limit_exceeded"}]})
+            elif batch["steps"] >= 3:
+                self.complete(batch)
+        return SimpleNamespace(id=batch_id, **{k: batch[k] for k in ("status", "output_file_id", "error_file_id", "errors")})
+
+    def complete(self, batch):
+        output, errors = [], []
+        for i, line in enumerate(batch["lines"]):
+            req = json.loads(line)
+            rid = req["custom_id"]
+            self.attempts[rid] = self.attempts.get(rid, 0) + 1
+            bad = rid in self.broken or (rid in self.flaky and self.attempts[rid] == 1)
+            kind = i % 3 if bad else None
+            if kind == 0:
+                continue  # missing from the output
+            if kind == 1:
+                errors.append({"custom_id": rid, "response": {"status_code": 500, "body": {"error": {"message": "boom"}}}})
+                continue
+            content = "{not json" if kind == 2 else json.dumps({
+                "hex": {"title": "Mirrors", "slug": f"Mirrors {rid[:4]}!", "description_360": "a hall of mirrors",
+                        "central_imagery": "mirrors", "stations": [{"id": "0", "position_index": 0}]},
+                "summary_short": "short", "summary_long": "long", "entities": ["mirror"]})
+            output.append({"custom_id": rid, "response": {"status_code": 200, "body": {
+                "model": req["body"]["model"], "usage": {"prompt_tokens": 900, "completion_tokens": 700},
+                "choices": [{"finish_reason": "stop", "message": {"content": content}}]}}})
+        for key, lines in (("output_file_id", output), ("error_file_id", errors)):
+            if lines:
+                file_id = f"file-{len(self.uploads)}"
+                self.uploads[file_id] = "\n".join(json.dumps(l) for l in lines).encode()
+                batch[key] = file_id
+        batch["status"] = "completed"
+
+
+TEXTS = [f"I was in a hall of mirrors, number {i}, and every reflection was a different animal." for i in range(40)]
+
+
+def runner(client, state_path):
+    # Every report has the same estimate; the cap has room for 25 of them
+    return BatchAnalysis(TEXTS, str(state_path), client=client, chunk=10,
+                         max_enqueued_tokens=25 * estimate_tokens(TEXTS[0]), poll_s=0, retries=2)
+
+
+def test_failed_batches_and_bad_lines_are_retried(tmp_path):
+    ids = [report_id(t) for t in TEXTS]
+    client = FakeOpenAI(flaky=ids[:12], broken=ids[-1:])
+    analysis = runner(client, tmp_path / "state.json")
+    results = asyncio.run(analysis.run())
+
+    assert len(results) == len(TEXTS) - 1
+    assert all(r.hex.slug.startswith("mirrors") for r in results.values())
+    failed = analysis.state["reports"][ids[-1]]
+    assert failed["status"] == "failed" and failed["attempts"] == 3
+    # The enqueued-token cap held
+    assert 20 <= client.max_open_lines <= 25
+
+
+def test_rerun_resumes_from_the_state_file(tmp_path):
+    client = FakeOpenAI()
+    state_path = tmp_path / "state.json"
+    first = asyncio.run(runner(client, state_path).run())
+    batches = len(client.created)
+
+    again = asyncio.run(runner(client, state_path).run())
+    assert len(client.created) == batches
+    assert {t: r.dict() for t, r in again.items()} == {t: r.dict() for t, r in first.items()}
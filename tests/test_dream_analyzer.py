@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import dream_analyzer
+from dream_analyzer import DreamAnalysis, DreamGenerationResponse, InteractionResponse, strict_response_format
+
+
+def strict_violations(node, path="$"):
+    """Places where `node` breaks OpenAI's strict structured-output rules."""
+    found = []
+    if isinstance(node, dict):
+        if node.get("type") == "object":
+            props = node.get("properties")
+            if not props:
+                found.append(f"{path}: free-form object")
+            else:
+                if node.get("additionalProperties") is not False:
+                    found.append(f"{path}: additionalProperties not false")
+                if set(node.get("required", [])) != set(props):
+                    found.append(f"{path}: not every property required")
+        for key, value in node.items():
+            found += strict_violations(value, f"{path}.{key}")
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            found += strict_violations(value, f"{path}[{i}]")
+    return found
+
+
+@pytest.mark.parametrize("model", [DreamAnalysis, InteractionResponse])
+def test_llm_output_models_are_strict_valid(model):
+    response_format = strict_response_format(model)
+    assert response_format["json_schema"]["strict"] is True
+    assert strict_violations(response_format["json_schema"]["schema"]) == []
+
+
+def test_document_model_is_not_sent_to_the_llm():
+    # Asset fields are free-form maps; they would break strict mode
+    assert strict_violations(DreamGenerationResponse.model_json_schema())
+
+
+def test_batch_request_uses_the_strict_analysis_schema():
+    body = dream_analyzer.dream_batch_request("r1", "a heron in a flooded library")["body"]
+    assert body["response_format"] == strict_response_format(DreamAnalysis)
+
+
+def test_batch_result_becomes_a_document():
+    analysis = {
+        "hex": {"title": "Flooded Library", "slug": "Flooded Library!", "description_360": "water", "central_imagery": "heron",
+                "stations": [{"id": "0", "position_index": 0, "entity_name": "Heron", "state_start": None, "state_end": None,
+                              "entity_greeting": None, "entity_monologue": None, "interaction_options": []}]},
+        "summary_short": "s", "summary_long": "l", "entities": ["Heron"],
+    }
+    item = {"response": {"status_code": 200, "body": {
+        "model": "gpt-4o-mini", "usage": {"prompt_tokens": 10, "completion_tokens": 10},
+        "choices": [{"finish_reason": "stop", "message": {"content": json.dumps(analysis)}}]}}}
+    doc = dream_analyzer.parse_batch_result(item)
+    assert isinstance(doc, DreamGenerationResponse)
+    assert doc.hex.slug == "floodedlibrary"
+    assert doc.hex.stations[0].asset_status == "PENDING"
+    assert doc.hex.background_levels == {}
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import frame_batcher
+from frame_batcher import normalize_job, plan_steps, run_batches
+
+
+class StubPipe:
+    """Records every call; each output image names its prompt and input."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompt, image, strength, num_inference_steps, guidance_scale):
+        self.calls.append({"prompt": prompt, "image": image, "strength": strength})
+        return SimpleNamespace(images=[("out", p, len(self.calls)) for p in prompt])
+
+
+class Blank:
+    def __init__(self, width, height):
+        self.size = (width, height)
+
+
+JOBS = [
+    {"prompt_a": "heron", "prompt_b": "heron flying", "type": "sprite", "frames": 4},
+    {"prompt_a": "library", "type": "pano", "frames": 3},
+    {"prompt_a": "mirror", "type": "sprite", "frames": 2},
+    {"prompt_a": "small", "type": "sprite", "frames": 2, "width": 384, "height": 384},
+]
+
+
+def run(jobs=JOBS, max_batch=8):
+    pipe, frames, blanks, paddings = StubPipe(), [], [], []
+
+    def blank(w, h):
+        blanks.append(Blank(w, h))
+        return blanks[-1]
+
+    out = run_batches(pipe, jobs, lambda j, k, img: frames.append((j, k, img)), blank,
+                      set_padding=paddings.append, max_batch=max_batch)
+    return out, pipe, frames, blanks, paddings
+
+
+def test_jobs_are_grouped_by_resolution_and_padding():
+    jobs = [normalize_job(j) for j in JOBS]
+    steps = list(plan_steps(jobs))
+    groups = {}
+    for key, k, strength, idxs in steps:
+        groups.setdefault(key, set()).update(idxs)
+        assert {frame_batcher.group_key(jobs[j]) for j in idxs} == {key}
+    assert list(groups.values()) == [{0, 2}, {1}, {3}]
+    # Groups run back to back, so each key appears in one contiguous run
+    keys = [key for key, *_ in steps]
+    assert keys == sorted(keys, key=keys.index)
+
+
+def test_padding_switches_once_per_group():
+    jobs, _, _, _, paddings = run()
+    # 512 sprites, the pano, then the 384 sprite
+    assert paddings == ["zeros", "circular", "zeros"]
+
+
+def test_frame_k_of_each_job_lands_in_its_slot():
+    jobs, pipe, frames, _, _ = run()
+    slots = {(j, k): img for j, k, img in frames}
+    assert sorted(slots) == [(j, k) for j, job in enumerate(jobs) for k in range(job["frames"])]
+    for (j, k), img in slots.items():
+        assert img[1] == frame_batcher.frame_prompt(jobs[j], k)
+    # Second half of a job's frames switch to prompt_b
+    assert slots[(0, 3)][1].endswith("heron flying")
+
+
+def test_each_frame_starts_from_the_previous_output():
+    _, pipe, frames, _, _ = run()
+    produced = {id(img): (j, k) for j, k, img in frames}
+    for n, call in enumerate(pipe.calls, 1):
+        slots = [(j, k) for j, k, img in frames if img[2] == n]
+        for (j, k), image in zip(slots, call["image"]):
+            if k == 0:
+                assert isinstance(image, Blank) and call["strength"] == 1.0
+            else:
+                assert produced[id(image)] == (j, k - 1)
+
+
+def test_blank_canvases_are_never_emitted():
+    jobs, _, frames, blanks, _ = run()
+    assert len(blanks) == len(jobs)  # one starting canvas per job
+    assert not any(isinstance(img, Blank) for _, _, img in frames)
+    assert all(img[0] == "out" for _, _, img in frames)
+
+
+def test_max_batch_splits_a_frame_step():
+    jobs = [{"prompt_a": f"p{i}", "type": "sprite", "frames": 1} for i in range(5)]
+    _, pipe, frames, _, _ = run(jobs, max_batch=2)
+    assert [len(c["prompt"]) for c in pipe.calls] == [2, 2, 1]
+    assert sorted(j for j, _, _ in frames) == list(range(5))
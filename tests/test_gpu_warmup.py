@@ -0,0 +1,102 @@
+import asyncio
+
+from gpu_warmup import WarmupManager
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def manager(clock, wakes, **kw):
+    async def wake(pool):
+        wakes.append(pool)
+    return WarmupManager(wake, ["pano", "sprite"], warm_ttl=100, coalesce=15, rate_window=600, clock=clock, **kw)
+
+
+def test_a_burst_of_requests_wakes_each_pool_once():
+    async def scenario():
+        clock, wakes = Clock(), []
+        warmup = manager(clock, wakes)
+        results = [warmup.request() for _ in range(50)]
+        await asyncio.sleep(0)  # let the wake tasks run
+        return warmup, results, wakes
+
+    warmup, results, wakes = asyncio.run(scenario())
+    assert sorted(wakes) == ["pano", "sprite"]
+    assert results[0] == {"pano": "waking", "sprite": "waking"}
+    # The wake-ups haven't returned yet, so the rest of the burst joins them
+    assert all(r == {"pano": "coalesced", "sprite": "coalesced"} for r in results[1:])
+    assert warmup.stats["pano"]["wakes"] == 1 and warmup.stats["pano"]["coalesced"] == 49
+    assert warmup.is_warm("pano")
+
+
+def test_warm_pool_expires_after_the_ttl():
+    async def scenario():
+        clock, wakes = Clock(), []
+        warmup = manager(clock, wakes)
+        warmup.mark_warm("pano")
+        first = warmup.ensure_warm("pano")
+        clock.now += 101
+        second = warmup.ensure_warm("pano")
+        await asyncio.sleep(0)
+        return first, second, wakes
+
+    first, second, wakes = asyncio.run(scenario())
+    assert (first, second) == ("warm", "waking")
+    assert wakes == ["pano"]
+
+
+def test_tick_wakes_only_when_more_submissions_are_likely():
+    async def scenario():
+        clock, wakes = Clock(), []
+        warmup = manager(clock, wakes)
+        quiet = warmup.tick()
+        for _ in range(10):  # one a minute: P(another within the TTL) is high
+            warmup.note_submission()
+            clock.now += 60
+        busy = warmup.tick()
+        await asyncio.sleep(0)
+        return quiet, busy, warmup
+
+    quiet, busy, warmup = asyncio.run(scenario())
+    assert quiet == {}
+    assert busy == {"pano": "waking", "sprite": "waking"}
+    assert warmup.stats["pano"]["predictive_wakes"] == 1
+    assert warmup.stats["pano"]["requests"] == 0
+
+
+def test_track_files_calls_as_cold_or_warm_and_marks_the_pool_warm():
+    async def scenario():
+        clock, wakes = Clock(), []
+        warmup = manager(clock, wakes)
+        kinds = []
+        for _ in range(2):
+            async with warmup.track("sprite") as kind:
+                kinds.append(kind)
+        return kinds, warmup.snapshot()["pools"]["sprite"]
+
+    kinds, snap = asyncio.run(scenario())
+    assert kinds == ["cold", "warm"]
+    assert snap["warm"] is True
+    assert snap["latency"]["cold"]["calls"] == 1 and snap["latency"]["warm"]["calls"] == 1
+
+
+def test_failed_wake_does_not_mark_the_pool_warm():
+    async def scenario():
+        clock = Clock()
+
+        async def wake(pool):
+            raise RuntimeError("modal down")
+
+        warmup = WarmupManager(wake, ["pano"], clock=clock)
+        warmup.request()
+        await asyncio.sleep(0)
+        return warmup
+
+    warmup = asyncio.run(scenario())
+    assert not warmup.is_warm("pano")
+    assert warmup.inflight == {}
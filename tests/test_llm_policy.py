@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+import llm_policy
+from llm_policy import HEDGE_MIN_SAMPLES, LLMCallFailed, LLMPolicy
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_policy, "BACKOFF_BASE_S", 0.001)
+
+
+def scripted(*steps):
+    """make_call that plays `steps` in order: a value to return, an exception to raise, or (delay, value)."""
+    calls = []
+
+    def make_call():
+        step = steps[min(len(calls), len(steps) - 1)]
+        calls.append(step)
+
+        async def call():
+            delay, result = step if isinstance(step, tuple) else (0, step)
+            await asyncio.sleep(delay)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return call()
+
+    make_call.calls = calls
+    return make_call
+
+
+def test_transient_errors_and_invalid_output_are_retried():
+    policy = LLMPolicy("t", deadline=5, attempt_timeout=1, retries=2, hedge=False)
+    make_call = scripted(asyncio.TimeoutError(), "bad", "good")
+
+    def validate(result):
+        if result != "good":
+            raise ValueError("invalid")
+
+    assert asyncio.run(policy.run(make_call, validate)) == "good"
+    assert len(make_call.calls) == 3
+    assert policy.stats["retries"] == 2
+
+
+def test_gives_up_after_the_retry_budget():
+    policy = LLMPolicy("t", deadline=5, attempt_timeout=1, retries=1, hedge=False)
+    make_call = scripted(asyncio.TimeoutError())
+    with pytest.raises(LLMCallFailed) as failed:
+        asyncio.run(policy.run(make_call))
+    assert failed.value.attempts == 2
+    assert policy.stats["failures"] == 1
+
+
+def test_non_transient_errors_are_not_retried():
+    policy = LLMPolicy("t", deadline=5, attempt_timeout=1, retries=3, hedge=False)
+    make_call = scripted(KeyError("bug"))
+    with pytest.raises(KeyError):
+        asyncio.run(policy.run(make_call))
+    assert len(make_call.calls) == 1
+
+
+def test_attempt_timeout_and_deadline_bound_a_hung_call():
+    policy = LLMPolicy("t", deadline=0.3, attempt_timeout=0.1, retries=10, hedge=False)
+    make_call = scripted((10, "never"))
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(LLMCallFailed):
+            await policy.run(make_call)
+        return loop.time() - started
+
+    assert asyncio.run(timed()) < 0.5
+
+
+def test_slow_attempt_is_hedged_and_the_duplicate_wins():
+    policy = LLMPolicy("t", deadline=5, attempt_timeout=3, retries=0, hedge=True)
+    policy.latencies.extend([0.02] * HEDGE_MIN_SAMPLES)
+    make_call = scripted((2, "slow"), (0.01, "fast"))
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await policy.run(make_call)
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result == "fast"
+    assert elapsed < 0.5
+    assert policy.stats["hedges"] == 1 and policy.stats["hedge_wins"] == 1
+
+
+def test_no_hedging_on_a_cold_latency_estimate():
+    policy = LLMPolicy("t", deadline=5, attempt_timeout=3, retries=0, hedge=True)
+    make_call = scripted((0.1, "only"))
+    assert asyncio.run(policy.run(make_call)) == "only"
+    assert policy.stats["hedges"] == 0
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from pano_tiles import CUBEMAP_LEVELS, EQUIRECT_LEVELS, FACES, TILE_SIZE, recompose, tile_manifest, tile_set
+
+CUBEMAP_MAE_BOUND = 1.0  # per channel, out of 255; a real render measured ~0.67
+
+
+@pytest.fixture(scope="module")
+def pano():
+    """Smooth synthetic 2:1 panorama that wraps seamlessly at the seam."""
+    h, w = EQUIRECT_LEVELS[-1] // 2, EQUIRECT_LEVELS[-1]
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    lon, lat = (x + 0.5) / w * 2 * np.pi, (y + 0.5) / h * np.pi
+    arr = np.stack([127 + 100 * np.sin(lon) * np.sin(lat),
+                    127 + 100 * np.cos(2 * lon) * np.sin(lat),
+                    60 + 120 * y / h], -1)
+    return Image.fromarray(arr.clip(0, 255).astype(np.uint8))
+
+
+def round_trip(pano, layout):
+    tiles, meta = tile_set(pano, layout)
+    back = recompose(tiles, meta, layout, len(meta) - 1, pano.width, pano.height)
+    ref = np.asarray(pano, dtype=np.float32)
+    # Skip the poles, where any equirect resampling is ill-conditioned
+    band = slice(pano.height // 8, pano.height - pano.height // 8)
+    return tiles, np.abs(np.asarray(back, dtype=np.float32)[band] - ref[band]).mean()
+
+
+def test_equirect_tiles_recompose_exactly(pano):
+    tiles, err = round_trip(pano, "equirect")
+    assert err == 0
+    assert len(tiles) == sum((w // TILE_SIZE) * (w // 2 // TILE_SIZE) for w in EQUIRECT_LEVELS)
+
+
+def test_cubemap_round_trip_stays_within_tolerance(pano):
+    tiles, err = round_trip(pano, "cubemap")
+    assert err < CUBEMAP_MAE_BOUND
+    assert len(tiles) == len(FACES) * sum((s // TILE_SIZE) ** 2 for s in CUBEMAP_LEVELS)
+    assert all(tile.size == (TILE_SIZE, TILE_SIZE) for _, tile in tiles)
+
+
+def test_manifest_lists_faces_only_for_cubemaps():
+    _, meta = tile_set(Image.new("RGB", (512, 256)), "equirect", levels=[512])
+    manifest = tile_manifest("equirect", meta, "bg/{frame}/{tile}.jpg")
+    assert manifest["faces"] is None
+    assert manifest["levels"] == [{"level": 0, "width": 512, "height": 256, "cols": 2, "rows": 1}]
+    with pytest.raises(ValueError):
+        tile_set(Image.new("RGB", (512, 256)), "octahedral")
@@ -0,0 +1,63 @@
+import quality_tiers
+from quality_tiers import DEPTH_THRESHOLDS, LATENCY_THRESHOLDS, QualityController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tier_drops_at_once_with_depth():
+    controller = QualityController(clock=Clock())
+    tiers = [controller.acquire() for _ in range(DEPTH_THRESHOLDS[2] + 1)]
+    assert tiers[0] == "full"
+    assert tiers[DEPTH_THRESHOLDS[1]] == "reduced"
+    assert tiers[DEPTH_THRESHOLDS[2]] == "minimal"
+
+
+def test_backlog_counts_as_depth():
+    controller = QualityController(clock=Clock())
+    assert controller.acquire(backlog=DEPTH_THRESHOLDS[2]) == "minimal"
+
+
+def test_slow_frames_drop_the_tier_and_stale_samples_expire():
+    clock = Clock()
+    controller = QualityController(clock=clock)
+    controller.observe(seconds=LATENCY_THRESHOLDS[2] * 4, frames=4)
+    assert controller.pressure() == 2
+    clock.now += quality_tiers.LATENCY_MAX_AGE_S + 1
+    assert controller.frame_latency() is None
+    assert controller.pressure() == 0
+
+
+def test_tier_climbs_back_one_step_per_calm_period():
+    clock = Clock()
+    controller = QualityController(restore_after=60, clock=clock)
+    for _ in range(DEPTH_THRESHOLDS[2]):
+        controller.acquire()
+    assert controller.acquire() == "minimal"
+    for _ in range(DEPTH_THRESHOLDS[2] + 1):
+        controller.release()
+
+    seen = []
+    for _ in range(5):
+        seen.append(controller.acquire())
+        controller.release()
+        clock.now += 61
+    # Calm starts at the first quiet acquire; each step up waits a full period
+    assert seen == ["minimal", "reduced", "full", "full", "full"]
+
+
+def test_release_never_goes_negative():
+    controller = QualityController(clock=Clock())
+    controller.release()
+    assert controller.active == 0
+
+
+def test_pinned_tier_ignores_pressure():
+    controller = QualityController(pinned="test", clock=Clock())
+    assert all(controller.acquire() == "test" for _ in range(20))
+    assert controller.snapshot()["tier"] == "test"
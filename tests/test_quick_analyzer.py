@@ -0,0 +1,15 @@
+from quick_analyzer import provisional_analysis
+
+REPORT = "I walked through a flooded library at night. Then John Dee stood by the shelves holding a mirror."
+
+
+def test_proper_names_keep_their_casing():
+    stations = {s["entity_name"]: s for s in provisional_analysis(REPORT)["hex"]["stations"]}
+    dee = stations["John Dee"]
+    assert dee["entity_greeting"] == "John Dee waits."
+    assert dee["interaction_options"][0] == "Approach John Dee"
+
+
+def test_common_nouns_take_the_article():
+    stations = {s["entity_name"]: s for s in provisional_analysis(REPORT)["hex"]["stations"]}
+    assert stations["Mirror"]["entity_greeting"] == "The mirror waits."
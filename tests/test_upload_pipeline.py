@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+
+from upload_pipeline import ERROR_URL, UploadPipeline, upload_bytes
+
+
+class FakeBucket:
+    name = "fake-bucket"
+
+    def __init__(self, upload_s=0.0, fail_paths=(), fail_times=0):
+        self.upload_s = upload_s
+        self.fail_paths = set(fail_paths)
+        self.fail_times = fail_times
+        self.attempts = {}
+        self.uploaded = []
+        self.lock = threading.Lock()
+
+    def blob(self, path):
+        bucket = self
+
+        class Blob:
+            def upload_from_file(self, f, content_type=None):
+                with bucket.lock:
+                    bucket.attempts[path] = bucket.attempts.get(path, 0) + 1
+                    attempt = bucket.attempts[path]
+                time.sleep(bucket.upload_s)
+                if path in bucket.fail_paths and attempt <= bucket.fail_times:
+                    raise IOError("503 from fake GCS")
+                with bucket.lock:
+                    bucket.uploaded.append(path)
+
+        return Blob()
+
+
+def render_for(key, index, tiers=("full",)):
+    return lambda image: [(tier, f"{key}/{index}_{tier}.webp", b"data", "image/webp") for tier in tiers]
+
+
+def test_prepare_runs_in_submission_order_per_key():
+    seen = {"a": [], "b": []}
+
+    def prepare_for(key):
+        def prepare(image):
+            # Jittered work, so an unordered pool would interleave
+            time.sleep(random.uniform(0, 0.01))
+            seen[key].append(image)
+            return image
+        return prepare
+
+    with UploadPipeline(FakeBucket(), workers=8) as uploads:
+        for i in range(20):
+            for key in seen:
+                uploads.submit(key, i, i, render_for(key, i), prepare_for(key))
+        urls = {key: uploads.urls(key) for key in seen}
+
+    assert seen == {"a": list(range(20)), "b": list(range(20))}
+    assert urls["a"] == [f"https://storage.googleapis.com/fake-bucket/a/{i}_full.webp" for i in range(20)]
+
+
+def test_urls_come_back_in_frame_order_with_every_tier():
+    with UploadPipeline(FakeBucket(), workers=4) as uploads:
+        for i in reversed(range(5)):
+            uploads.submit("job", i, i, render_for("job", i, ("full", "md")))
+        assert [u.rsplit("/", 1)[1] for u in uploads.urls("job", "md")] == [f"{i}_md.webp" for i in range(5)]
+
+
+def test_failed_prepare_or_render_becomes_error_url_without_stopping_the_rest():
+    def broken_prepare(image):
+        if image == 1:
+            raise RuntimeError("matting failed")
+        return image
+
+    def render(image):
+        if image == 3:
+            raise RuntimeError("encode failed")
+        return render_for("job", image)(image)
+
+    bucket = FakeBucket()
+    with UploadPipeline(bucket) as uploads:
+        for i in range(5):
+            uploads.submit("job", i, i, render, broken_prepare)
+        urls = uploads.urls("job")
+
+    assert urls[1] == ERROR_URL and urls[3] == ERROR_URL
+    assert all(u != ERROR_URL for i, u in enumerate(urls) if i not in (1, 3))
+    assert sorted(bucket.uploaded) == ["job/0_full.webp", "job/2_full.webp", "job/4_full.webp"]
+
+
+def test_uploads_retry_then_give_up():
+    sleeps = []
+    flaky = FakeBucket(fail_paths={"p"}, fail_times=2)
+    assert upload_bytes(flaky, b"x", "p", "image/webp", retries=3, backoff=0.5, sleep=sleeps.append).endswith("/p")
+    assert sleeps == [0.5, 1.0]
+
+    dead = FakeBucket(fail_paths={"p"}, fail_times=99)
+    assert upload_bytes(dead, b"x", "p", "image/webp", retries=3, sleep=lambda s: None) == ERROR_URL
+    assert dead.attempts["p"] == 3
+
+
+def test_uploads_overlap_generation():
+    gen_s, upload_s, frames, tiers = 0.05, 0.04, 8, ("full", "md", "sm")
+    bucket = FakeBucket(upload_s=upload_s)
+    started = time.perf_counter()
+    with UploadPipeline(bucket, workers=4) as uploads:
+        for i in range(frames):
+            time.sleep(gen_s)  # the diffusion step
+            uploads.submit("job", i, i, render_for("job", i, tiers))
+        uploads.urls("job")
+    elapsed = time.perf_counter() - started
+
+    serial = frames * (gen_s + len(tiers) * upload_s)
+    # Only the last frame's uploads may trail generation
+    assert elapsed < frames * gen_s + len(tiers) * upload_s + 0.15
+    assert elapsed < 0.7 * serial
+    assert len(bucket.uploaded) == frames * len(tiers)
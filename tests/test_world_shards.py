@@ -0,0 +1,32 @@
+import json
+
+from world_shards import SHARD_NAME, dump, shard_world
+
+
+def dream(slug, assets):
+    return {"slug": slug, "title": slug.title(), "world_state": {"generated_assets": assets}, "stations": []}
+
+
+WORLD = {"version": "3.4", "dreams": [
+    dream("heron", {"level_2": {"file_paths": ["h2.png"]}, "level_1": {"file_paths": ["h1.png"]}}),
+    dream("mirror", {"level_1": {"file_paths": []}, "level_3": {"file_paths": ["m3.png"]}}),
+    dream("void", {}),
+]}
+
+
+def test_thumbnail_is_the_first_level_with_paths():
+    index, _, _ = shard_world(WORLD)
+    assert [e["thumbnail"] for e in index["dreams"]] == ["h1.png", "m3.png", None]
+
+
+def test_shards_are_content_addressed_and_stable():
+    index, body, shards = shard_world(WORLD)
+    assert all(SHARD_NAME.match(name) for name in shards)
+    assert json.loads(shards[index["dreams"][0]["shard"]]) == WORLD["dreams"][0]
+    assert shard_world(json.loads(dump(WORLD)))[1] == body
+
+    changed = json.loads(dump(WORLD))
+    changed["dreams"][0]["title"] = "Grey Heron"
+    new_index, _, _ = shard_world(changed)
+    assert new_index["dreams"][0]["shard"] != index["dreams"][0]["shard"]
+    assert new_index["dreams"][1]["shard"] == index["dreams"][1]["shard"]